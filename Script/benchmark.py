@@ -0,0 +1,209 @@
+"""
+Query Pipeline Benchmark
+Runs a fixed query mix over synthetic corpora of increasing size
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from faker import Faker
+
+from data_generator import generate_emails, generate_calendar_events
+from src.nlp.entity_extractor import EXTRACTION_TIERS
+from src.query.engine import QueryEngine
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Query mix taken from the README and output.txt examples
+QUERY_MIX = [
+    "email from sarah to james",
+    "email from sarah",
+    "email from sarah cc james",
+    "email from john cc kevin",
+    "email by legal team about onboarding",
+    "email by hr team about interview",
+    "code review meeting in conference a",
+    "interview call in zoom",
+    "project update meeting since last 4 days",
+    "emails about deployment and not legal",
+]
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def corpus_paths(data_dir, size, seed):
+    return (os.path.join(data_dir, f"emails_{size}_{seed}.json"),
+            os.path.join(data_dir, f"calendar_events_{size}_{seed}.json"))
+
+
+def generate_corpus(data_dir, size, seed):
+    """Write `size` records (half emails, half events) unless already generated"""
+    emails_path, calendar_path = corpus_paths(data_dir, size, seed)
+    if os.path.exists(emails_path) and os.path.exists(calendar_path):
+        return emails_path, calendar_path
+
+    random.seed(seed)
+    Faker.seed(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    for path, records in ((emails_path, generate_emails(size // 2)),
+                          (calendar_path, generate_calendar_events(size - size // 2))):
+        with open(path + ".tmp", "w") as f:
+            json.dump(records, f)
+        os.replace(path + ".tmp", path)
+    return emails_path, calendar_path
+
+
+def run_size(emails_path, calendar_path, metadata_path, repeat, limit, columnar, extraction_tier):
+    """Benchmark one corpus; runs in its own process so peak RSS is per corpus"""
+    # Each corpus compiles its own entity metadata next to it
+    artifact_path = emails_path.replace("emails_", "metadata_").replace(".json", ".compiled.json")
+    engine = QueryEngine(emails_path, calendar_path, metadata_path, columnar=columnar,
+                         extraction_tier=extraction_tier, metadata_artifact=artifact_path)
+
+    start = time.perf_counter()
+    engine._load_all_sources()
+    load_seconds = time.perf_counter() - start
+    warmup_seconds = engine.warmup()
+
+    latencies = {query: [] for query in QUERY_MIX}
+    matches = {}
+    engine.instrumentation.reset()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        run_start = time.perf_counter()
+        for _ in range(repeat):
+            for query in QUERY_MIX:
+                start = time.perf_counter()
+                results = engine.process_query(query, use_cache=False, limit=limit)
+                latencies[query].append(time.perf_counter() - start)
+                matches[query] = results.total
+        run_seconds = time.perf_counter() - run_start
+    stages = engine.instrumentation.metrics()
+
+    samples = [seconds for runs in latencies.values() for seconds in runs]
+    return {
+        "records": sum(len(engine.source(kind).records) for kind in ("email", "calendar")),
+        "load_seconds": load_seconds,
+        "warmup_seconds": warmup_seconds,
+        "queries": len(samples),
+        "throughput_qps": len(samples) / run_seconds,
+        "latency_ms": {
+            **{f"p{pct}": percentile(samples, pct) * 1000 for pct in PERCENTILES},
+            "mean": statistics.mean(samples) * 1000,
+            "max": max(samples) * 1000,
+        },
+        "per_query_p50_ms": {query: percentile(runs, 50) * 1000 for query, runs in latencies.items()},
+        "matches": matches,
+        # Mean time per query spent in each stage
+        "stages_ms": {stage: totals["seconds"] / len(samples) * 1000 for stage, totals in stages.items()},
+        "extraction": engine.entity_extractor.tier_stats(),
+        "dates": engine.date_parser.path_stats(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(results, baseline):
+    """Percent change of the headline numbers against a baseline run"""
+    changes = {}
+    for size, result in results.items():
+        base = baseline.get("sizes", {}).get(size)
+        if base is None:
+            continue
+        pairs = {
+            "p50_ms": (result["latency_ms"]["p50"], base["latency_ms"]["p50"]),
+            "p95_ms": (result["latency_ms"]["p95"], base["latency_ms"]["p95"]),
+            "throughput_qps": (result["throughput_qps"], base["throughput_qps"]),
+            "peak_rss_mb": (result["peak_rss_mb"], base["peak_rss_mb"]),
+        }
+        changes[size] = {name: (new - old) / old * 100 if old else None for name, (new, old) in pairs.items()}
+    return changes
+
+
+def print_report(results, changes):
+    for size, result in results.items():
+        latency = result["latency_ms"]
+        print(f"\n📊 {int(size):,} records (load {result['load_seconds']:.1f}s, "
+              f"warm-up {result['warmup_seconds']:.1f}s, peak RSS {result['peak_rss_mb']:.0f} MB)")
+        print(f"  latency ms: p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  "
+              f"p95 {latency['p95']:.2f}  p99 {latency['p99']:.2f}  max {latency['max']:.2f}")
+        print(f"  throughput: {result['throughput_qps']:.1f} queries/s")
+        print("  stages ms: " + "  ".join(f"{stage} {ms:.2f}" for stage, ms in result["stages_ms"].items()))
+        for name, change in changes.get(size, {}).items():
+            if change is not None:
+                print(f"  vs baseline {name}: {change:+.1f}%")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the query pipeline on synthetic corpora")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Corpus sizes in records (half emails, half events)")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs of the query mix per corpus")
+    arg_parser.add_argument("--limit", type=int, default=25, help="Page size per query (0 for all)")
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--data-dir", default="Data/bench", help="Where generated corpora are kept")
+    arg_parser.add_argument("--metadata", default="Data/metadata.json")
+    arg_parser.add_argument("--columnar", action="store_true")
+    arg_parser.add_argument("--extraction-tier", choices=EXTRACTION_TIERS, default="auto")
+    arg_parser.add_argument("--output", default="benchmark_results.json")
+    arg_parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    args = arg_parser.parse_args(argv)
+
+    results = {}
+    for size in args.sizes:
+        print(f"🚀 Benchmarking {size:,} records")
+        # Generation and each benchmark run get their own process, so one
+        # corpus' memory never shows up in another's peak RSS
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            emails_path, calendar_path = pool.submit(generate_corpus, args.data_dir, size, args.seed).result()
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results[str(size)] = pool.submit(run_size, emails_path, calendar_path, args.metadata,
+                                             args.repeat, args.limit or None, args.columnar,
+                                             args.extraction_tier).result()
+
+    changes = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            changes = compare(results, json.load(f))
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "config": {"repeat": args.repeat, "limit": args.limit, "seed": args.seed,
+                   "columnar": args.columnar, "extraction_tier": args.extraction_tier,
+                   "queries": QUERY_MIX},
+        "sizes": results,
+        "baseline_change_pct": changes,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(results, changes)
+    print(f"\n📁 Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -175,8 +175,8 @@ def save_metadata():
     """Save metadata (people, teams, topics, locations) to a JSON file"""
     metadata = {
         "people": sorted(PEOPLE),
-        "teams": sorted(TEAMS),
-        "topics": sorted(TOPICS),
+        "team": sorted(TEAMS),
+        "topic": sorted(TOPICS),
         "locations": sorted(LOCATIONS),
         "meeting_types": sorted(MEETING_TYPES)
         
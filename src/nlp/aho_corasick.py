@@ -0,0 +1,85 @@
+from collections import deque
+from typing import Dict, Generic, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def is_word_char(char: str) -> bool:
+    """Whether `char` counts as a word character for regex `\\b`"""
+    return char.isalnum() or char == "_"
+
+
+def at_word_boundary(text: str, position: int) -> bool:
+    """Whether regex `\\b` would match at `position` of `text`"""
+    before = position > 0 and is_word_char(text[position - 1])
+    after = position < len(text) and is_word_char(text[position])
+    return before != after
+
+
+class AhoCorasick(Generic[T]):
+    def __init__(self):
+        """
+        Multi-pattern string matcher.
+
+        Every pattern is added to a trie whose nodes are then linked to the
+        longest proper suffix that is also in the trie, so a single pass over
+        the text finds every occurrence of every pattern, in time linear in
+        the text plus the number of matches, however many patterns there are.
+
+        Each pattern carries payloads (e.g. the category and canonical value
+        of a dictionary entry), reported with every match.
+        """
+        # Node 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Node -> (pattern length, payload) for patterns ending there
+        self._patterns: List[List[Tuple[int, T]]] = [[]]
+        # Same, plus the patterns reached through failure links once built
+        self._out: List[List[Tuple[int, T]]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, payload: T) -> None:
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._patterns.append([])
+            node = next_node
+        self._patterns[node].append((len(pattern), payload))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links; called automatically before the first search after `add`"""
+        self._out = [list(patterns) for patterns in self._patterns]
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+        self._built = True
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """Yield (start, end, payload) for every occurrence of every pattern, overlaps included"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, payload in out[node]:
+                yield end - length, end, payload
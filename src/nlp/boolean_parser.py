@@ -41,7 +41,14 @@ class BooleanParser:
         tokens = self.tokenize(query)
         return self.to_postfix(tokens)
 
-    def evaluate(self, postfix: List[str], match_fn: Callable[[str], Set[int]]) -> Set[int]:
+    def evaluate(self, postfix: List[str], match_fn: Callable[[str], Set[int]], universe=None) -> Set[int]:
+        """
+        Evaluate a postfix expression against `match_fn` result sets.
+
+        Works with any set-like result type (`set`, `src.query.bitmap.Bitmap`, ...).
+        NOT is a complement against `universe`; when it is not given,
+        `match_fn("__ALL__")` is fetched once and reused for every NOT.
+        """
         stack = []
         for token in postfix:
             if token.upper() == "AND":
@@ -54,12 +61,15 @@ class BooleanParser:
                 stack.append(a | b)
             elif token.upper() == "NOT":
                 a = stack.pop()
-                all_items = match_fn("__ALL__")
-                stack.append(all_items - a)
+                if universe is None:
+                    universe = match_fn("__ALL__")
+                stack.append(universe - a)
             else:
                 stack.append(match_fn(token))
 
-        return stack[0] if stack else set()
+        if stack:
+            return stack[0]
+        return universe - universe if universe is not None else set()
 
 # if __name__ == "__main__":
 #     parser = BooleanParser()
@@ -1,11 +1,106 @@
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="dateparser")
 
-import dateparser
-from dateparser.search import search_dates
-from typing import Optional, Tuple, List, Union
+from typing import Dict, Optional, Tuple, List, Union
+import calendar
 import re
-from datetime import datetime, timedelta
+import threading
+from datetime import date, datetime, timedelta
+
+
+def _dateparser():
+    # dateparser takes a while to import, so it is only loaded on first use
+    import dateparser
+    return dateparser
+
+
+def search_dates(text: str, settings: dict = None):
+    from dateparser.search import search_dates as _search_dates
+    return _search_dates(text, settings=settings)
+
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1}
+
+_MONTH = "(?:" + "|".join(sorted(MONTHS, key=len, reverse=True)) + ")"
+_WEEKDAY = "(?:" + "|".join(WEEKDAYS) + ")"
+_MONTH_NAMES = "(?:january|february|march|april|may|june|july|august|september|october|november|december)"
+_SHORT_MONTHS = "(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)"
+
+# The patterns `_contains_date_keywords` used to try one by one
+DATE_KEYWORDS_PATTERN = re.compile(
+    r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"           # MM/DD/YYYY, DD/MM/YYYY
+    r"|\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b"            # YYYY/MM/DD
+    rf"|\b\d{{1,2}}\s+{_SHORT_MONTHS}"                # DD Month
+    rf"|\b{_SHORT_MONTHS}\s+\d{{1,2}}"                # Month DD
+    rf"|\b{_MONTH_NAMES}\b"
+    r"|\b(?:today|tomorrow|yesterday)\b"
+    rf"|\b(?:this|last|next)\s+(?:week|month|year|{_WEEKDAY})\b"
+    rf"|\b(?:before|after|since|from|until|between)\s+(?:\d|{_SHORT_MONTHS}|{_MONTH_NAMES})"
+    rf"|\bin\s+(?:{_SHORT_MONTHS}|{_MONTH_NAMES})"
+    r"|\bin\s+\d{4}\b"                              # in 2025
+)
+
+# Anything dateparser might read as a date. Text without any of it has no
+# date; text with some the grammar below does not explain goes to dateparser.
+DATE_VOCABULARY_PATTERN = re.compile(
+    rf"\b(?:{_MONTH}|{_WEEKDAY}|mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun"
+    r"|today|tonight|tomorrow|yesterday|now|noon|midnight|ago|hence|weekend|fortnight"
+    r"|next|after|till|until|days?|weeks?|months?|years?|hours?|minutes?|am|pm)\b"
+    r"|\d{4}|\d[/:.-]\d|\d(?:st|nd|rd|th)\b|\d(?:am|pm|h)\b"
+)
+
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+# One day: ISO and numeric dates, "july 22", "22 july 2025"
+_DAY_POINT = (rf"\d{{4}}[/-]\d{{1,2}}[/-]\d{{1,2}}|\d{{1,2}}[/-]\d{{1,2}}[/-]\d{{4}}"
+              rf"|{_MONTH} {_DAY}(?:,? \d{{4}})?|{_DAY} {_MONTH}(?: \d{{4}})?")
+# A day or a month ("jan 2025", "march"), which stands for its first day
+_POINT = rf"{_DAY_POINT}|{_MONTH}(?: \d{{4}})?"
+
+# Date expressions resolved without dateparser, matched against lowercased
+# text with single spaces. Each alternative is a named group handled by
+# `DateParser._resolve`; at the same position, earlier ones win.
+DATE_GRAMMAR = re.compile(
+    rf"\b(?:from|between) (?P<range_start>{_POINT}) (?:to|until|and) (?P<range_end>{_POINT})\b"
+    rf"|\bin (?P<in_month>{_MONTH}(?: \d{{4}})?)\b"
+    rf"|\b(?:since|before) (?P<bound>{_POINT}|today|yesterday)\b"
+    r"|\b(?:(?:in|since|over|during|for) )?(?:the )?(?:last|past|previous) (?P<last_n>\d+) (?P<last_unit>day|week|month)s?\b"
+    r"|\b(?P<ago_n>\d+|an?|one) (?P<ago_unit>day|week|month)s? ago\b"
+    r"|\b(?P<relative_day>today|yesterday|tomorrow)\b"
+    rf"|\b(?:(?:on|this|last) )?(?P<weekday>{_WEEKDAY})\b"
+    rf"|\b(?:on )?(?P<date>{_DAY_POINT})\b"
+)
+
+# Bumped whenever DATE_GRAMMAR or how its matches resolve changes, since
+# cached date results depend on it
+GRAMMAR_VERSION = 1
+
+# Words dateparser's search finds in the text but which are never dates there
+NOT_DATES = ['to', 'from', 'at', 'in', 'on', 'by', 'for', 'with', 'and', 'or']
+
+MONTH_YEAR_PATTERN = re.compile(r'^([a-zA-Z]{3,9})\s+(\d{4})$')
+MONTH_ONLY_PATTERN = re.compile(r'^([a-zA-Z]{3,9})$')
+RANGE_PATTERNS = [
+    re.compile(r'from\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)\s+to\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)'),
+    re.compile(r'between\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)\s+and\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)'),
+]
+IN_MONTH_PATTERN = re.compile(r'in\s+([a-zA-Z]+\s+\d{4}|[a-zA-Z]+)')
+SINCE_PATTERN = re.compile(r'(since|after|till)\s+')
+BEFORE_PATTERN = re.compile(r'before\s+')
+
+
+def add_months(day: date, months: int) -> date:
+    """`day` moved by whole months, clamped to the end of shorter months"""
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
 
 
 class DateParser:
@@ -16,12 +111,121 @@ class DateParser:
         Args:
             reference (datetime, optional): Reference date for relative parsing.
         """
-        self.reference = reference or datetime.now()
+        self.set_reference(reference or datetime.now())
+        # Queries answered by the rule grammar vs. handed to dateparser
+        self.path_counts = {"rules": 0, "dateparser": 0}
+        self._counts_lock = threading.Lock()
+
+    def warmup(self) -> None:
+        """Import dateparser and its search module ahead of the first query."""
+        _dateparser()
+        search_dates("", settings=self.settings)
+
+    def set_reference(self, reference: datetime) -> None:
+        """Resolve relative dates against `reference` from now on"""
+        self.reference = reference
         self.settings = {
-            "RELATIVE_BASE": self.reference,
+            "RELATIVE_BASE": reference,
             "PREFER_DAY_OF_MONTH": "first",
         }
 
+    def cache_version(self) -> str:
+        """Everything parsed dates depend on besides the text and the reference day"""
+        return f"rules-v{GRAMMAR_VERSION}:dateparser=={_dateparser().__version__}"
+
+    def _count(self, path: str) -> None:
+        with self._counts_lock:
+            self.path_counts[path] += 1
+
+    def path_stats(self) -> Dict[str, float]:
+        """How many queries the rule grammar resolved and how many fell back to dateparser"""
+        with self._counts_lock:
+            total = sum(self.path_counts.values())
+            return {**self.path_counts, "rule_hit_rate": self.path_counts["rules"] / total if total else 0.0}
+
+    def _point(self, text: str) -> Optional[date]:
+        """A `_POINT` expression as a date; months stand for their first day. None if invalid."""
+        text = text.replace(",", "")
+        today = self.reference.date()
+        try:
+            if text[0].isdigit() and ("/" in text or "-" in text):
+                first, second, third = (int(part) for part in re.split(r"[/-]", text))
+                if first > 31:
+                    return date(first, second, third)
+                # Month first, as dateparser reads English dates, unless it cannot be a month
+                if first > 12:
+                    first, second = second, first
+                return date(third, first, second)
+            words = text.split()
+            if words[0] in MONTHS:
+                month, rest = MONTHS[words[0]], words[1:]
+            else:
+                month, rest = MONTHS[words[1]], [words[0]] + words[2:]
+            day, year = 1, today.year
+            for word in rest:
+                if word.isdigit() and len(word) == 4:
+                    year = int(word)
+                else:
+                    # A day, possibly with an ordinal suffix ("22nd")
+                    day = int(word.rstrip("stndrh"))
+            return date(year, month, day)
+        except ValueError:
+            return None
+
+    def _resolve(self, match: "re.Match") -> Optional[List[str]]:
+        """Dates of one `DATE_GRAMMAR` match, as `extract_all_dates` returns them"""
+        today = self.reference.date()
+        groups = match.groupdict()
+        if groups["range_start"]:
+            start, end = self._point(groups["range_start"]), self._point(groups["range_end"])
+            return [start.isoformat(), end.isoformat()] if start and end else None
+        if groups["in_month"]:
+            start = self._point(groups["in_month"])
+            if start is None:
+                return None
+            last_day = calendar.monthrange(start.year, start.month)[1]
+            return [start.isoformat(), start.replace(day=last_day).isoformat()]
+        if groups["bound"]:
+            if groups["bound"] in ("today", "yesterday"):
+                day = today - timedelta(days=groups["bound"] == "yesterday")
+            else:
+                day = self._point(groups["bound"])
+            return [day.isoformat()] if day else None
+        if groups["last_n"] or groups["ago_n"]:
+            count, unit = (groups["last_n"], groups["last_unit"]) if groups["last_n"] else (groups["ago_n"], groups["ago_unit"])
+            count = NUMBER_WORDS.get(count) or int(count)
+            if unit == "month":
+                return [add_months(today, -count).isoformat()]
+            return [(today - timedelta(days=count * (7 if unit == "week" else 1))).isoformat()]
+        if groups["relative_day"]:
+            offset = {"yesterday": -1, "today": 0, "tomorrow": 1}[groups["relative_day"]]
+            return [(today + timedelta(days=offset)).isoformat()]
+        if groups["weekday"]:
+            # The latest such day up to today, as dateparser picks it
+            back = (today.weekday() - WEEKDAYS.index(groups["weekday"])) % 7
+            return [(today - timedelta(days=back)).isoformat()]
+        day = self._point(groups["date"])
+        return [day.isoformat()] if day else None
+
+    def _rule_dates(self, text: str) -> Optional[List[str]]:
+        """
+        Resolve the dates of `text` with the precompiled grammar.
+
+        Returns:
+            The dates when the text has no date vocabulary at all or exactly
+            one expression the grammar resolves; None when dateparser must decide
+        """
+        text = " ".join(text.lower().split())
+        matches = list(DATE_GRAMMAR.finditer(text))
+        if len(matches) > 1:
+            return None
+        rest = text
+        if matches:
+            rest = text[:matches[0].start()] + " " + text[matches[0].end():]
+        if DATE_VOCABULARY_PATTERN.search(rest):
+            return None
+        return self._resolve(matches[0]) if matches else []
+
     def _parse_date_with_month_first(self, date_str: str) -> Optional[datetime]:
         """
         Parse a date string, ensuring month-only or month-year patterns start from the 1st.
@@ -29,52 +233,27 @@ class DateParser:
         date_str = date_str.strip()
         
         # Check if it's a month-year pattern (e.g., "jan 2025", "january 2025")
-        month_year_pattern = r'^([a-zA-Z]{3,9})\s+(\d{4})$'
-        match = re.match(month_year_pattern, date_str)
+        match = MONTH_YEAR_PATTERN.match(date_str)
         if match:
             month_name = match.group(1)
             year = match.group(2)
             date_str = f"{month_name} 1, {year}"
         
         # Also handle month-only patterns (e.g., "jan", "january")
-        month_only_pattern = r'^([a-zA-Z]{3,9})$'
-        match = re.match(month_only_pattern, date_str)
+        match = MONTH_ONLY_PATTERN.match(date_str)
         if match:
             month_name = match.group(1)
             year = self.reference.year
             date_str = f"{month_name} 1, {year}"
         
-        return dateparser.parse(date_str, settings=self.settings)
+        return _dateparser().parse(date_str, settings=self.settings)
     
     def _contains_date_keywords(self, text: str) -> bool:
         """
         Check if the text contains actual date-related keywords.
         This helps avoid false positives like "to" being parsed as a date.
         """
-        text = text.lower()
-    
-    # Common date patterns and keywords
-        date_patterns = [
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',  # MM/DD/YYYY, DD/MM/YYYY
-            r'\b\d{4}[/-]\d{1,2}[/-]\d{1,2}\b',    # YYYY/MM/DD
-            r'\b\d{1,2}\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)',  # DD Month
-            r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\s+\d{1,2}',  # Month DD
-            r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\b',
-            r'\b(today|tomorrow|yesterday)\b',
-            r'\b(this|last|next)\s+(week|month|year|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-            r'\b(before|after|since|from|until|between)\s+\d',
-            r'\b(before|after|since|from|until|between)\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)',
-            r'\b(before|after|since|from|until|between)\s+(january|february|march|april|may|june|july|august|september|october|november|december)',
-            r'\bin\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)',
-            r'\bin\s+(january|february|march|april|may|june|july|august|september|october|november|december)',
-            r'\bin\s+\d{4}\b',  # in 2025
-        ]
-    
-        for pattern in date_patterns:
-            if re.search(pattern, text):
-                return True
-    
-        return False
+        return DATE_KEYWORDS_PATTERN.search(text.lower()) is not None
     
     def parse_single_date(self, text: str) -> Optional[str]:
         """
@@ -97,7 +276,7 @@ class DateParser:
             for date_str, dt in results:
                 date_str_lower = date_str.lower()
                 # Skip common words that might be misinterpreted as dates
-                if date_str_lower in ['to', 'from', 'at', 'in', 'on', 'by', 'for', 'with', 'and', 'or']:
+                if date_str_lower in NOT_DATES:
                     continue
                 filtered_results.append((date_str, dt))
         
@@ -115,12 +294,8 @@ class DateParser:
 
         # Full range: 'from X to Y' or 'between X and Y'
         # Use more specific patterns to avoid capturing too much
-        patterns = [
-            r'from\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)\s+to\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)',
-            r'between\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)\s+and\s+([a-zA-Z]+\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{4}|[a-zA-Z]+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in RANGE_PATTERNS:
+            match = pattern.search(text)
             if match:
                 start_str = match.group(1).strip()
                 end_str = match.group(2).strip()
@@ -130,7 +305,7 @@ class DateParser:
                     return (start.date().isoformat(), end.date().isoformat())
 
         # Handle "in [month year]" or "in [month]" patterns - should return full month range
-        in_month_pattern = re.search(r'in\s+([a-zA-Z]+\s+\d{4}|[a-zA-Z]+)', text)
+        in_month_pattern = IN_MONTH_PATTERN.search(text)
         if in_month_pattern:
             month_str = in_month_pattern.group(1).strip()
             start_date = self._parse_date_with_month_first(month_str)
@@ -144,7 +319,7 @@ class DateParser:
                 return (start_date.date().isoformat(), last_day.date().isoformat())
 
         # Open-ended "since" / "after"  
-        since_match = re.search(r'(since|after|till)\s+', text)
+        since_match = SINCE_PATTERN.search(text)
         if since_match:
             remaining_text = text[since_match.end():]
             # results = search_dates(remaining_text, settings=self.settings)
@@ -164,12 +339,12 @@ class DateParser:
             else:
                 relative_settings = self.settings
 
-            parsed_date = dateparser.parse(remaining_text, settings=relative_settings)
+            parsed_date = _dateparser().parse(remaining_text, settings=relative_settings)
             if parsed_date:
                 return (parsed_date.date().isoformat(), None)
             
         # Open-ended "before"
-        before_match = re.search(r'before\s+', text)  
+        before_match = BEFORE_PATTERN.search(text)  
         if before_match:
             remaining_text = text[before_match.end():]
             results = search_dates(remaining_text, settings=self.settings)
@@ -181,7 +356,29 @@ class DateParser:
         """
         Extract all unique dates mentioned in the text.
         For range expressions, extract the actual start and end dates.
+
+        Common expressions ("last 3 days", "in july", "since jan 2025",
+        "yesterday", ISO dates) and text without dates are resolved by the
+        rule grammar in microseconds; anything else goes to dateparser.
         """
+        dates = self.rule_dates(text)
+        if dates is not None:
+            return dates
+        return self.fallback_dates(text)
+
+    def rule_dates(self, text: str) -> Optional[List[str]]:
+        """`extract_all_dates` through the rule grammar alone; None when dateparser must decide"""
+        dates = self._rule_dates(text)
+        if dates is not None:
+            self._count("rules")
+        return dates
+
+    def fallback_dates(self, text: str) -> List[str]:
+        """`extract_all_dates` through dateparser, for text `rule_dates` does not resolve"""
+        self._count("dateparser")
+        return self._dateparser_dates(text)
+
+    def _dateparser_dates(self, text: str) -> List[str]:
         # First try to parse as a range
         range_result = self.parse_date_range(text)
         if range_result:
@@ -1,36 +1,220 @@
-import spacy
+import hashlib
 import json
-from typing import Dict, Set
+import threading
+from functools import lru_cache
+from importlib import metadata as importlib_metadata
+from typing import Dict, List, Set, Tuple
 import re
 
+from src.nlp.aho_corasick import AhoCorasick, at_word_boundary
+from src.nlp.people_index import PeopleIndex
+
+DEFAULT_METADATA_PATH = "Data/metadata.json"
+
+# Plain tables derived from the metadata, see `compiled_tables`; the keyword
+# automaton and people index are rebuilt from them
+COMPILED_TABLES = ["metadata", "metadata_version", "processed_metadata", "known_words"]
+
+# Dictionary categories matched by the keyword automaton. Teams and locations
+# match anywhere in the text; topics and meeting types only as whole words.
+DICTIONARY_CATEGORIES = {
+    'team': False,
+    'topic': True,
+    'meeting_types': True,
+    'locations': False,
+}
+
+# How entities are extracted: "dictionary" uses the compiled dictionaries
+# only, "ner" always runs spaCy NER for people as well, and "auto" runs NER
+# only when a capitalized word no dictionary knows is left in the query
+EXTRACTION_TIERS = ["dictionary", "ner", "auto"]
+
+# Pipes of the en_core_web models never loaded, since only `doc.ents` is used
+NER_EXCLUDED_PIPES = ["tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer"]
+
+# Capitalized words common in queries that are never names, so they do not
+# trigger NER in the "auto" tier
+COMMON_QUERY_WORDS = {
+    "show", "find", "get", "list", "search", "give", "any", "all", "the", "a", "an", "i", "my", "me",
+    "email", "emails", "mail", "mails", "message", "messages", "meeting", "meetings", "event", "events",
+    "calendar", "call", "calls", "schedule", "team", "from", "to", "cc", "by", "about", "with", "in", "on",
+    "at", "since", "until", "between", "before", "after", "last", "next", "this", "past", "today",
+    "yesterday", "tomorrow", "week", "month", "year", "and", "or", "not",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+}
+
+# Words after which the next word is taken to be a name, so a misspelt one
+# is looked up in the typo-tolerant people index
+PERSON_CUE_WORDS = {"from", "to", "cc", "with", "by"}
+
+
+@lru_cache(maxsize=None)
+def package_version(name: str) -> str:
+    """Installed version of a package, or "unknown" (part of cache keys)"""
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
 class MeetingEntityExtractor:
-    def __init__(self, metadata_file_path: str = None, metadata_dict: dict = None):
+    def __init__(self, metadata_file_path: str = None, metadata_dict: dict = None,
+                 model_name: str = "en_core_web_sm", tier: str = "auto", compiled: Dict = None):
         """
         Initialize the extractor with metadata
         
         Args:
-            metadata_file_path: Path to metadata.json file
+            metadata_file_path: Path to metadata.json file (defaults to Data/metadata.json
+                when no metadata_dict is given)
             metadata_dict: Dictionary containing metadata (alternative to file)
+            model_name: spaCy model loaded on first use
+            tier: One of `EXTRACTION_TIERS`
+            compiled: Lookup tables from `compiled_tables` (e.g. loaded from a
+                compiled metadata artifact); used instead of metadata when given
         """
-        # Load spaCy model
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            print("Please install spaCy English model: python -m spacy download en_core_web_sm")
-            raise
-        
-        metadata_file_path="Data/metadata.json"
+        if tier not in EXTRACTION_TIERS:
+            raise ValueError(f"tier must be one of {EXTRACTION_TIERS}")
+        self.tier = tier
+        # spaCy model is loaded lazily, see `nlp`
+        self.model_name = model_name
+        self._nlp = None
+        # Texts answered from the dictionaries alone vs. also run through NER
+        self.tier_counts = {"dictionary": 0, "ner": 0}
+        self._counts_lock = threading.Lock()
+
+        if compiled is not None:
+            self.use_tables(compiled)
+            return
+
+        if metadata_file_path is None and metadata_dict is None:
+            metadata_file_path = DEFAULT_METADATA_PATH
         # Load metadata
         if metadata_file_path:
             with open(metadata_file_path, 'r') as f:
-                self.metadata = json.load(f)
+                metadata = json.load(f)
         elif metadata_dict:
-            self.metadata = metadata_dict
+            metadata = metadata_dict
         else:
             raise ValueError("Either metadata_file_path or metadata_dict must be provided")
+        self.use_metadata(metadata)
+
+    def use_metadata(self, metadata: Dict) -> None:
+        """Rebuild every lookup table from `metadata`, keeping the loaded spaCy model"""
+        self.metadata = metadata
+        # Identifies the metadata in cache keys
+        self.metadata_version = hashlib.sha256(
+            json.dumps(self.metadata, sort_keys=True).encode("utf-8")).hexdigest()[:16]
         
         # Preprocess metadata for better matching
         self.processed_metadata = self._preprocess_metadata()
+        # Every word of a dictionary key, plus common query words
+        self.known_words = set(COMMON_QUERY_WORDS)
+        for entries in self.processed_metadata.values():
+            for key in entries:
+                self.known_words.update(re.findall(r'\w+', key))
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        self.matcher = self._build_matcher()
+        self.people_index = PeopleIndex(self.metadata['people'],
+                                        self.metadata.get('frequencies', {}).get('people'))
+
+    def compiled_tables(self) -> Dict:
+        """The tables derived from the metadata, as plain JSON-serializable data for `compiled=`"""
+        tables = {name: getattr(self, name) for name in COMPILED_TABLES}
+        tables["known_words"] = sorted(self.known_words)
+        return tables
+
+    def cache_version(self) -> str:
+        """
+        Everything extraction results depend on besides the text: model and
+        its version, tier and metadata. Computed without loading spaCy.
+        """
+        return f"{self.model_name}=={package_version(self.model_name)}:{self.tier}:{self.metadata_version}"
+
+    def use_tables(self, compiled: Dict) -> None:
+        """Switch to lookup tables from `compiled_tables`, keeping the loaded spaCy model"""
+        for name in COMPILED_TABLES:
+            setattr(self, name, compiled[name])
+        self.known_words = set(self.known_words)
+        self._build_indexes()
+
+    @property
+    def nlp(self):
+        """
+        spaCy pipeline with only the NER component running, loaded on first access.
+
+        Pipes NER does not depend on are excluded or disabled, so a query
+        only pays for tokenization and NER.
+        """
+        if self._nlp is None:
+            import spacy
+            try:
+                nlp = spacy.load(self.model_name, exclude=NER_EXCLUDED_PIPES)
+            except OSError:
+                print(f"Please install spaCy English model: python -m spacy download {self.model_name}")
+                raise
+            # Keep shared embedding layers (tok2vec, transformer) only if NER listens to them
+            for name in nlp.pipe_names:
+                if name != "ner" and "ner" not in getattr(nlp.get_pipe(name), "listening_components", []):
+                    nlp.disable_pipe(name)
+            self._nlp = nlp
+        return self._nlp
+
+    def warmup(self) -> None:
+        """Load the NER pipeline ahead of the first query, unless the tier never uses it"""
+        if self.tier != "dictionary":
+            self.nlp
+
+    def needs_ner(self, text: str, aliases: Dict[str, str] = None) -> bool:
+        """
+        Whether this text goes through NER under the extractor's tier
+
+        `aliases` is the text's `person_aliases`, when the caller already has them.
+        """
+        if self.tier != "auto":
+            return self.tier == "ner"
+        if aliases is None:
+            aliases = self.person_aliases(text)
+        for word in re.findall(r'\w+', text):
+            lowered = word.lower()
+            if word[0].isupper() and lowered not in self.known_words and lowered not in aliases:
+                return True
+        return False
+
+    def person_aliases(self, text: str) -> Dict[str, str]:
+        """
+        Misspelt names in the text and the identities they resolve to.
+
+        Only words in a name position (capitalized, or right after "from",
+        "to", "cc", "with" or "by") that are neither known names nor other
+        known words are looked up, and only an unambiguous closest match
+        within `max_typos` edits is taken.
+        """
+        aliases = {}
+        previous = ""
+        for raw in text.split():
+            word = re.sub(r'[^\w]', '', raw.lower())
+            name_position = raw[:1].isupper() or previous in PERSON_CUE_WORDS
+            previous = word
+            if (not name_position or word in self.known_words
+                    or word in self.processed_metadata['people'] or word in aliases):
+                continue
+            person = self.people_index.resolve(word)
+            if person is not None:
+                aliases[word] = person
+        return aliases
+
+    def _count(self, tier: str, texts: int = 1) -> None:
+        with self._counts_lock:
+            self.tier_counts[tier] += texts
+
+    def tier_stats(self) -> Dict[str, int]:
+        """How many texts were answered from the dictionaries alone and how many also ran NER"""
+        with self._counts_lock:
+            return {"tier": self.tier, **self.tier_counts}
     
     def _preprocess_metadata(self) -> Dict:
         """Preprocess metadata to handle variations and create lookup dictionaries"""
@@ -85,9 +269,23 @@ class MeetingEntityExtractor:
         
         return processed
     
+    def _build_matcher(self) -> AhoCorasick:
+        """
+        Compile the keys of every dictionary category into one automaton, so
+        keyword matching is a single pass over the query however large the
+        dictionaries are.
+        """
+        matcher = AhoCorasick()
+        for category, whole_word in DICTIONARY_CATEGORIES.items():
+            for key, value in self.processed_metadata[category].items():
+                matcher.add(key, (category, value, whole_word))
+        matcher.build()
+        return matcher
+
     def extract_entities(self, text: str) -> Dict[str, Set[str]]:
         """
-        Extract entities from text using spaCy and metadata matching
+        Extract entities from text using metadata matching and, depending on
+        the tier, spaCy NER for people
         
         Args:
             text: Input text to extract entities from
@@ -95,19 +293,50 @@ class MeetingEntityExtractor:
         Returns:
             Dictionary with extracted entities for each category
         """
-        # Process text with spaCy (keep original case for NER)
-        doc = self.nlp(text)
-        text_lower = text.lower()
-        
-        # Initialize result sets
-        result = {
-            'people': set(),
-            'team': set(),
-            'topic': set(),
-            'meeting_types': set(),
-            'locations': set()
-        }
+        return self.extract_with_aliases(text)[0]
+
+    def extract_with_aliases(self, text: str) -> Tuple[Dict[str, Set[str]], Dict[str, str]]:
+        """Like `extract_entities`, also returning the text's `person_aliases`"""
+        aliases = self.person_aliases(text)
+        result = self._dictionary_entities(text, aliases)
+        if self.needs_ner(text, aliases):
+            # Process text with spaCy (keep original case for NER)
+            self._add_ner_people(result, self.nlp(text))
+            self._count("ner")
+        else:
+            self._count("dictionary")
+        return result, aliases
+
+    def extract_entities_batch(self, texts: List[str], batch_size: int = 64,
+                               n_process: int = 1) -> List[Dict[str, Set[str]]]:
+        """
+        Extract entities for many texts, streaming those that need NER through `nlp.pipe`
         
+        Args:
+            texts: Input texts
+            batch_size: Number of texts spaCy processes per batch
+            n_process: Number of processes spaCy uses (1 runs in-process)
+            
+        Returns:
+            One entity dictionary per input text, in order
+        """
+        return [result for result, _ in self.extract_batch_with_aliases(texts, batch_size, n_process)]
+
+    def extract_batch_with_aliases(self, texts: List[str], batch_size: int = 64, n_process: int = 1
+                                   ) -> List[Tuple[Dict[str, Set[str]], Dict[str, str]]]:
+        """Like `extract_entities_batch`, pairing each result with the text's `person_aliases`"""
+        aliases = [self.person_aliases(text) for text in texts]
+        results = [self._dictionary_entities(text, text_aliases) for text, text_aliases in zip(texts, aliases)]
+        ner_rows = [n for n, text in enumerate(texts) if self.needs_ner(text, aliases[n])]
+        if ner_rows:
+            docs = self.nlp.pipe((texts[n] for n in ner_rows), batch_size=batch_size, n_process=n_process)
+            for n, doc in zip(ner_rows, docs):
+                self._add_ner_people(results[n], doc)
+        self._count("ner", len(ner_rows))
+        self._count("dictionary", len(texts) - len(ner_rows))
+        return list(zip(results, aliases))
+
+    def _add_ner_people(self, result: Dict[str, Set[str]], doc) -> None:
         # Extract people using spaCy NER (with original case)
         for ent in doc.ents:
             if ent.label_ == "PERSON":
@@ -117,36 +346,35 @@ class MeetingEntityExtractor:
                 else:
                     # If not in metadata, add the detected name as-is (lowercase)
                     result['people'].add(person_text)
+
+    def _dictionary_entities(self, text: str, aliases: Dict[str, str]) -> Dict[str, Set[str]]:
+        text_lower = text.lower()
+        
+        # Initialize result sets
+        result = {
+            'people': set(),
+            'team': set(),
+            'topic': set(),
+            'meeting_types': set(),
+            'locations': set()
+        }
         
-        # Additional pattern matching for people (fallback)
-        # Look for names that spaCy might have missed
+        # Pattern matching for people; NER, when it runs, adds names not in
+        # the dictionary
         words = text_lower.split()
         for word in words:
             clean_word = re.sub(r'[^\w]', '', word)
             if clean_word in self.processed_metadata['people']:
                 result['people'].add(self.processed_metadata['people'][clean_word])
+        # and for misspelt names
+        result['people'].update(aliases.values())
         
-        # Extract other entities using keyword matching
-        # Match teams
-        for key, value in self.processed_metadata['team'].items():
-            if key in text_lower:
-                result['team'].add(value)
-        
-        # Match topics (be more specific to avoid false positives)
-        for key, value in self.processed_metadata['topic'].items():
-            # Use word boundaries for better matching
-            if re.search(r'\b' + re.escape(key) + r'\b', text_lower):
-                result['topic'].add(value)
-        
-        # Match meeting types
-        for key, value in self.processed_metadata['meeting_types'].items():
-            if re.search(r'\b' + re.escape(key) + r'\b', text_lower):
-                result['meeting_types'].add(value)
-        
-        # Match locations
-        for key, value in self.processed_metadata['locations'].items():
-            if key in text_lower:
-                result['locations'].add(value)
+        # Extract teams, topics, meeting types and locations by keyword matching
+        # (topics and meeting types need word boundaries to avoid false positives)
+        for start, end, (category, value, whole_word) in self.matcher.finditer(text_lower):
+            if whole_word and not (at_word_boundary(text_lower, start) and at_word_boundary(text_lower, end)):
+                continue
+            result[category].add(value)
         
         return result
     
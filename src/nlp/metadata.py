@@ -0,0 +1,211 @@
+"""
+Compiled metadata artifact
+
+Derives entity metadata (people, teams, topics, meeting types, locations and
+how often each occurs) from the email and calendar data, compiles the entity
+extractor's lookup tables from it, and stores them in one versioned JSON
+file. Only plain tables are stored; the keyword automaton and people index
+are rebuilt from them on load.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from src.nlp.entity_extractor import MeetingEntityExtractor
+
+# Bumped whenever the artifact layout or the compiled tables change
+ARTIFACT_VERSION = 3
+
+DEFAULT_ARTIFACT_PATH = "Data/metadata.compiled.json"
+
+# Keys older metadata.json files used for some categories
+LEGACY_KEYS = {"teams": "team", "topics": "topic"}
+
+# Metadata category -> record fields its values come from
+CATEGORY_FIELDS = {
+    "people": ["sender", "recipients", "cc", "attendees", "organizer"],
+    "team": ["team"],
+    "topic": ["topic"],
+    "meeting_types": ["meeting_type"],
+    "locations": ["location"],
+}
+
+
+def derive_metadata(records: Iterable[dict], base: Optional[Dict] = None) -> Dict:
+    """
+    Metadata as found in the data.
+
+    Args:
+        records: Email and calendar records
+        base: Curated metadata (metadata.json) whose values are kept even
+            when the data does not use them
+
+    Returns:
+        A metadata dict (one sorted list per category) with a "frequencies"
+        entry counting how many records mention each value
+    """
+    counts = {category: Counter() for category in CATEGORY_FIELDS}
+    for record in records:
+        for category, fields in CATEGORY_FIELDS.items():
+            values = set()
+            for field in fields:
+                value = record.get(field)
+                if isinstance(value, list):
+                    values.update(value)
+                elif value:
+                    values.add(value)
+            counts[category].update(values)
+
+    base = {LEGACY_KEYS.get(key, key): values for key, values in (base or {}).items()}
+    metadata = {}
+    for category, counter in counts.items():
+        metadata[category] = sorted(set(counter) | set(base.get(category, [])))
+    metadata["frequencies"] = {category: dict(counter) for category, counter in counts.items()}
+    return metadata
+
+
+def fingerprint(paths: List[str]) -> List:
+    """Cheap change detector: (path, size, mtime) of each source file"""
+    result = []
+    for path in paths:
+        stat = os.stat(path)
+        result.append([path, stat.st_size, stat.st_mtime_ns])
+    return result
+
+
+def source_hash(paths: List[str]) -> str:
+    """SHA-256 over the contents of the source files, in order"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_header(path: str) -> Optional[Dict]:
+    """The artifact's JSON header line, or None if it is missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def load_artifact(path: str) -> Dict:
+    """
+    Load a compiled artifact.
+
+    The file is one JSON header line, so staleness checks need not parse
+    the rest, followed by one JSON line with the metadata and tables.
+
+    Returns:
+        {"header": ..., "metadata": ..., "tables": ...}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        payload = json.loads(f.readline())
+    return {"header": header, **payload}
+
+
+def build_artifact(path: str, sources: List[str], metadata_path: Optional[str] = None) -> Dict:
+    """
+    Derive metadata from the data, compile the extractor tables and write
+    them to `path` (atomically, so concurrent readers never see a partial file;
+    concurrent builders each write their own temporary file and the last
+    rename wins).
+
+    Args:
+        path: Artifact file to write
+        sources: Email and calendar JSON files
+        metadata_path: Optional curated metadata.json merged into the result
+    """
+    base = None
+    inputs = list(sources)
+    if metadata_path and os.path.exists(metadata_path):
+        with open(metadata_path, "r") as f:
+            base = json.load(f)
+        inputs.append(metadata_path)
+
+    records = []
+    for source in sources:
+        with open(source, "r", encoding="utf-8") as f:
+            records.extend(json.load(f))
+    metadata = derive_metadata(records, base)
+    tables = MeetingEntityExtractor(metadata_dict=metadata).compiled_tables()
+
+    header = {
+        "version": ARTIFACT_VERSION,
+        "source_hash": source_hash(inputs),
+        "sources": fingerprint(inputs),
+    }
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        # mkstemp creates the file private to its owner
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            f.write(json.dumps({"metadata": metadata, "tables": tables}) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {"header": header, "metadata": metadata, "tables": tables}
+
+
+def is_current(header: Optional[Dict], inputs: List[str]) -> bool:
+    """
+    Whether an artifact header still matches the source files.
+
+    Unchanged sizes and modification times are trusted; otherwise the
+    contents are hashed, so touching a file without changing it does not
+    force a rebuild.
+    """
+    if not header or header.get("version") != ARTIFACT_VERSION:
+        return False
+    if header.get("sources") == fingerprint(inputs):
+        return True
+    return header.get("source_hash") == source_hash(inputs)
+
+
+def load_or_build(path: str, sources: List[str], metadata_path: Optional[str] = None) -> Dict:
+    """
+    Load the artifact at `path`, rebuilding it first if it is missing, from
+    an older version, or the hash of its source files has changed.
+    """
+    inputs = list(sources)
+    if metadata_path and os.path.exists(metadata_path):
+        inputs.append(metadata_path)
+    if is_current(read_header(path), inputs):
+        return load_artifact(path)
+    return build_artifact(path, sources, metadata_path)
+
+
+def main(argv: List[str] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Compile entity metadata from the email and calendar data")
+    arg_parser.add_argument("--emails", default="Data/emails.json")
+    arg_parser.add_argument("--calendar", default="Data/calendar_events.json")
+    arg_parser.add_argument("--metadata", default="Data/metadata.json", help="Curated metadata to merge in")
+    arg_parser.add_argument("--output", default=DEFAULT_ARTIFACT_PATH)
+    arg_parser.add_argument("--force", action="store_true", help="Rebuild even if the sources are unchanged")
+    args = arg_parser.parse_args(argv)
+
+    sources = [args.emails, args.calendar]
+    if args.force:
+        artifact = build_artifact(args.output, sources, args.metadata)
+    else:
+        artifact = load_or_build(args.output, sources, args.metadata)
+    counts = ", ".join(f"{len(artifact['metadata'][category])} {category}" for category in CATEGORY_FIELDS)
+    print(f"📁 {args.output} (v{artifact['header']['version']}, sources {artifact['header']['source_hash'][:12]}): {counts}")
+
+
+if __name__ == "__main__":
+    main()
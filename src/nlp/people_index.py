@@ -0,0 +1,116 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def osa_distance(a: str, b: str) -> int:
+    """
+    Optimal string alignment distance: insertions, deletions, substitutions
+    and transpositions of adjacent characters each cost 1.
+    """
+    if a == b:
+        return 0
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def trigrams(word: str) -> Set[str]:
+    """Character trigrams of a word, padded so its first and last letters get their own"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(name: str) -> int:
+    """Edits tolerated in a name of this length: none below 4 characters, 1 up to 7, then 2"""
+    if len(name) < 4:
+        return 0
+    return 1 if len(name) < 8 else 2
+
+
+class PeopleIndex:
+    def __init__(self, people: Iterable[str], frequencies: Optional[Dict[str, int]] = None):
+        """
+        Typo-tolerant lookup of `first.last` identities.
+
+        Every identity is reachable by its id, first name, last name and
+        "first last". Those name keys are indexed by character trigram and
+        length, so a misspelt name only looks at keys of a similar length
+        sharing enough trigrams with it, and only those few candidates are
+        checked with the exact edit distance.
+
+        Args:
+            people: Identities such as "sarah.chen"
+            frequencies: Optional occurrences of each identity in the data;
+                among equally close candidates, frequent ones rank first
+        """
+        self.frequencies = frequencies or {}
+        # Name key -> identities it names
+        self.names: Dict[str, Set[str]] = {}
+        for person in people:
+            first, _, last = person.lower().partition(".")
+            keys = [person.lower(), first]
+            if last:
+                keys += [last, f"{first} {last}"]
+            for key in keys:
+                self.names.setdefault(key, set()).add(person)
+        # (key length, trigram) -> name keys
+        self.grams: Dict[Tuple[int, str], List[str]] = {}
+        for key in self.names:
+            for gram in trigrams(key):
+                self.grams.setdefault((len(key), gram), []).append(key)
+
+    def _candidates(self, name: str, max_distance: int) -> List[Tuple[int, str]]:
+        grams = trigrams(name)
+        # One edit changes at most 4 of a word's trigrams (a transposition
+        # touches two letters), so closer keys share at least this many
+        needed = len(grams) - 4 * max_distance
+        shared = Counter()
+        for length in range(len(name) - max_distance, len(name) + max_distance + 1):
+            for gram in grams:
+                shared.update(self.grams.get((length, gram), ()))
+        matches = []
+        for key, count in shared.items():
+            if count >= needed:
+                distance = osa_distance(name, key)
+                if distance <= max_distance:
+                    matches.append((distance, key))
+        return matches
+
+    def lookup(self, name: str, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Identities whose name keys are within `max_distance` edits of `name`,
+        as (person, distance) ranked by distance, then frequency, then name.
+
+        Args:
+            name: Name as typed (any case)
+            max_distance: Edits allowed; `max_typos(name)` by default
+        """
+        name = name.lower()
+        if max_distance is None:
+            max_distance = max_typos(name)
+        if max_distance == 0:
+            matches = [(0, name)] if name in self.names else []
+        else:
+            matches = self._candidates(name, max_distance)
+        best: Dict[str, int] = {}
+        for distance, key in matches:
+            for person in self.names[key]:
+                if distance < best.get(person, max_distance + 1):
+                    best[person] = distance
+        return sorted(best.items(), key=lambda item: (item[1], -self.frequencies.get(item[0], 0), item[0]))
+
+    def resolve(self, name: str) -> Optional[str]:
+        """The identity `name` most likely means, or None when there is no single closest match"""
+        candidates = self.lookup(name)
+        if not candidates:
+            return None
+        closest = [person for person, distance in candidates if distance == candidates[0][1]]
+        return closest[0] if len(closest) == 1 else None
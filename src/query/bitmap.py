@@ -0,0 +1,97 @@
+from typing import Iterable, Iterator
+
+# Set bit positions for every byte value, used to walk a bitset bytewise
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:
+    def _popcount(value: int) -> int:
+        return bin(value).count("1")
+
+
+class Bitmap:
+    """
+    Compact set of record ids backed by a Python int bitset.
+
+    AND/OR/difference run as single big-int operations instead of hash-set
+    operations, and a set of n ids costs n/8 bytes. Any class with the same
+    interface (`from_ids`, `full`, `&`, `|`, `-`, `len`, `iter`, `in`,
+    `nbytes`; optionally `from_bytes`) can be passed to `QueryEngine` and
+    `DataSource` as `bitmap_cls`; results of different classes are never mixed.
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, bits: int = 0):
+        self._bits = bits
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "Bitmap":
+        ids = list(ids)
+        if not ids:
+            return cls()
+        buf = bytearray((max(ids) >> 3) + 1)
+        for i in ids:
+            buf[i >> 3] |= 1 << (i & 7)
+        return cls(int.from_bytes(buf, "little"))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Bitmap":
+        """Build from a little-endian packed bitset (e.g. numpy.packbits(..., bitorder="little"))"""
+        return cls(int.from_bytes(data, "little"))
+
+    @classmethod
+    def full(cls, size: int) -> "Bitmap":
+        return cls((1 << size) - 1)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes the bitset occupies: one bit per id up to the highest set one"""
+        return (self._bits.bit_length() + 7) >> 3
+
+    def add(self, i: int) -> None:
+        self._bits |= 1 << i
+
+    def discard(self, i: int) -> None:
+        self._bits &= ~(1 << i)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self._bits & other._bits)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self._bits | other._bits)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self._bits & ~other._bits)
+
+    def __xor__(self, other: "Bitmap") -> "Bitmap":
+        return Bitmap(self._bits ^ other._bits)
+
+    def __contains__(self, i: int) -> bool:
+        return bool(self._bits >> i & 1)
+
+    def __len__(self) -> int:
+        return _popcount(self._bits)
+
+    def __bool__(self) -> bool:
+        return self._bits != 0
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Bitmap) and self._bits == other._bits
+
+    def __hash__(self) -> int:
+        return hash(self._bits)
+
+    def __iter__(self) -> Iterator[int]:
+        """Yield ids in ascending order"""
+        data = self._bits.to_bytes((self._bits.bit_length() + 7) // 8, "little")
+        for byte_index, byte in enumerate(data):
+            if byte:
+                base = byte_index << 3
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+    def __repr__(self) -> str:
+        return f"Bitmap({len(self)} ids)"
+
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class QueryCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic,
+                 maxbytes: Optional[int] = None, sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        Bounded LRU cache with per-entry expiry.
+
+        Args:
+            maxsize: Maximum number of entries; the least recently used entry is
+                evicted first. 0 disables caching.
+            ttl: Seconds an entry stays valid (None for no expiry)
+            clock: Time source, monotonic by default
+            maxbytes: Optional bound on the summed `sizeof` of all values;
+                values larger than this on their own are not cached
+            sizeof: Size of a value in bytes, required with `maxbytes`
+        """
+        if maxbytes is not None and sizeof is None:
+            raise ValueError("maxbytes requires sizeof")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        # key -> (expires, value, size)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Engines may be shared by server worker threads
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value, _ = entry
+                if expires is None or expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def _remove(self, key: Hashable) -> None:
+        self.nbytes -= self._entries.pop(key)[2]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        expires = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, value, size)
+            self.nbytes += size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
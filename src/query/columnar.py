@@ -0,0 +1,245 @@
+from typing import Dict, Iterable, List, Optional
+
+from src.query.bitmap import Bitmap
+from src.query.fulltext import value_filter
+from src.query.normalize import normalize_value, fold
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMNAR_AVAILABLE = np is not None
+
+# Low-cardinality string fields stored as integer codes into a category table
+CATEGORICAL_FIELDS = ["sender", "team", "topic", "location", "meeting_type"]
+# List-of-string fields stored CSR-style over the same kind of category table
+LIST_FIELDS = ["recipients", "cc", "attendees"]
+
+
+class _ListColumn:
+    """
+    CSR-style list column: row i holds `flat[starts[i]:ends[i]]`.
+
+    `owner` maps every flat entry back to its row, so a membership test over
+    `flat` turns into a row mask with one scatter. Replacing a row appends its
+    new entries and marks the old ones dead (owner -1) instead of shifting the
+    arrays.
+    """
+
+    def __init__(self):
+        self.flat = np.zeros(0, dtype=np.int32)
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.zeros(0, dtype=np.int64)
+        self.owner = np.zeros(0, dtype=np.int64)
+
+    def _encode(self, values: List[List[str]], categories: List[str], codes_by_value: Dict[str, int]):
+        flat = [_code_for(item, categories, codes_by_value) for items in values for item in items]
+        lengths = np.array([len(items) for items in values], dtype=np.int64)
+        return np.array(flat, dtype=np.int32), lengths
+
+    def append(self, values: List[List[str]], categories: List[str], codes_by_value: Dict[str, int]) -> None:
+        flat, lengths = self._encode(values, categories, codes_by_value)
+        first_row = len(self.starts)
+        starts = len(self.flat) + np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(lengths) else lengths
+        self.flat = np.concatenate((self.flat, flat))
+        self.starts = np.concatenate((self.starts, starts))
+        self.ends = np.concatenate((self.ends, starts + lengths))
+        rows = np.arange(first_row, first_row + len(values), dtype=np.int64)
+        self.owner = np.concatenate((self.owner, np.repeat(rows, lengths)))
+
+    def replace(self, row: int, items: List[str], categories: List[str], codes_by_value: Dict[str, int]) -> None:
+        self.owner[self.starts[row]:self.ends[row]] = -1
+        flat, _ = self._encode([items], categories, codes_by_value)
+        self.starts[row] = len(self.flat)
+        self.ends[row] = len(self.flat) + len(flat)
+        self.flat = np.concatenate((self.flat, flat))
+        self.owner = np.concatenate((self.owner, np.full(len(flat), row, dtype=np.int64)))
+
+
+def _code_for(value: str, categories: List[str], codes_by_value: Dict[str, int]) -> int:
+    code = codes_by_value.get(value)
+    if code is None:
+        code = len(categories)
+        codes_by_value[value] = code
+        categories.append(value)
+    return code
+
+
+def _timestamp_value(record: dict) -> "np.datetime64":
+    """A record's timestamp to the second; NaT if it is missing or malformed, as TimestampIndex skips those"""
+    timestamp = record.get("timestamp") or ""
+    if len(timestamp) < 10:
+        return np.datetime64("NaT", "s")
+    try:
+        return np.datetime64(timestamp[:19], "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+
+class ColumnarStore:
+    def __init__(self, records: List[dict], bitmap_cls=Bitmap):
+        """
+        Column-oriented index over a record list for vectorized filtering.
+
+        Timestamps are held as `datetime64`, low-cardinality fields as integer
+        codes, and recipient/cc/attendee lists as CSR arrays. Filters return
+        boolean masks over rows; the records themselves stay in the caller's
+        list, so only the filtered fields are stored here. Rows can be
+        appended and replaced in place as new data arrives.
+
+        Args:
+            records: Records to store; row ids are positions in this list
+            bitmap_cls: Result set type produced by `to_bitmap`
+        """
+        if np is None:
+            raise ImportError("ColumnarStore requires numpy: pip install numpy")
+
+        self.size = 0
+        self.bitmap_cls = bitmap_cls
+
+        self.timestamps = np.zeros(0, dtype="datetime64[s]")
+        self.days = np.zeros(0, dtype="datetime64[D]")
+
+        self.categories: Dict[str, List[str]] = {}
+        self._codes_by_value: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for field in CATEGORICAL_FIELDS:
+            self.categories[field] = []
+            self._codes_by_value[field] = {}
+            self.codes[field] = np.zeros(0, dtype=np.int32)
+
+        self.lists: Dict[str, _ListColumn] = {}
+        for field in LIST_FIELDS:
+            self.categories[field] = []
+            self._codes_by_value[field] = {}
+            self.lists[field] = _ListColumn()
+
+        # field -> casefolded categories, filled in as categories are added
+        self._folded: Dict[str, List[str]] = {field: [] for field in self.categories}
+        # field -> rows (list entries for list fields) per category code;
+        # planner statistics, dropped whenever rows change
+        self._code_counts: Dict[str, "np.ndarray"] = {}
+
+        self.append(records)
+
+    def _category_code(self, field: str, record: dict) -> int:
+        if field not in record:
+            return -1
+        return _code_for(record[field], self.categories[field], self._codes_by_value[field])
+
+    def append(self, records: List[dict]) -> None:
+        """Add records as new rows at the end of the store"""
+        if not records:
+            return
+        self._code_counts.clear()
+        timestamps = np.array([_timestamp_value(item) for item in records], dtype="datetime64[s]")
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        self.days = np.concatenate((self.days, timestamps.astype("datetime64[D]")))
+
+        for field in CATEGORICAL_FIELDS:
+            codes = np.array([self._category_code(field, item) for item in records], dtype=np.int32)
+            self.codes[field] = np.concatenate((self.codes[field], codes))
+
+        for field in LIST_FIELDS:
+            self.lists[field].append([item.get(field, []) for item in records],
+                                     self.categories[field], self._codes_by_value[field])
+
+        self.size += len(records)
+
+    def replace(self, row: int, record: dict) -> None:
+        """Overwrite row `row` with `record`"""
+        self._code_counts.clear()
+        self.timestamps[row] = _timestamp_value(record)
+        self.days[row] = self.timestamps[row].astype("datetime64[D]")
+        for field in CATEGORICAL_FIELDS:
+            self.codes[field][row] = self._category_code(field, record)
+        for field in LIST_FIELDS:
+            self.lists[field].replace(row, record.get(field, []),
+                                      self.categories[field], self._codes_by_value[field])
+
+    def _folded_categories(self, field: str) -> List[str]:
+        folded, categories = self._folded[field], self.categories[field]
+        if len(folded) < len(categories):
+            folded.extend(normalize_value(field, value) for value in categories[len(folded):])
+        return folded
+
+    def _category_hits(self, field: str, predicate) -> "np.ndarray":
+        return np.array(
+            [code for code, value in enumerate(self._folded_categories(field)) if predicate(value)],
+            dtype=np.int32,
+        )
+
+    def _mask_for_codes(self, field: str, hits: "np.ndarray") -> "np.ndarray":
+        if field in self.lists:
+            column = self.lists[field]
+            mask = np.zeros(self.size, dtype=bool)
+            rows = column.owner[np.isin(column.flat, hits)]
+            mask[rows[rows >= 0]] = True
+            return mask
+        return np.isin(self.codes[field], hits)
+
+    def _counts(self, field: str) -> "np.ndarray":
+        counts = self._code_counts.get(field)
+        if counts is None:
+            if field in self.lists:
+                column = self.lists[field]
+                codes = column.flat[column.owner >= 0]
+            else:
+                codes = self.codes[field][self.codes[field] >= 0]
+            counts = self._code_counts[field] = np.bincount(codes, minlength=len(self.categories[field]))
+        return counts
+
+    def count_equal(self, field: str, value: str) -> int:
+        """Number of rows `equals_mask(field, value)` selects, from cached per-category counts"""
+        value = fold(value)
+        return int(self._counts(field)[self._category_hits(field, lambda v: v == value)].sum())
+
+    def estimate(self, term: str, fields: Iterable[str], mode: str = "substring") -> int:
+        """
+        Upper bound on the rows `search_mask(term, fields, mode)` selects,
+        from cached per-category counts instead of a pass over the rows
+        (list fields count entries, so a row may be counted twice)
+        """
+        if mode == "substring":
+            term = fold(term)
+            accept = lambda value: term in value
+        else:
+            _, accept = value_filter(term, mode)
+        return sum(int(self._counts(field)[self._category_hits(field, accept)].sum()) for field in fields)
+
+    def equals_mask(self, field: str, value: str) -> "np.ndarray":
+        """Rows whose `field` equals `value` (case-insensitive)"""
+        value = fold(value)
+        return self._mask_for_codes(field, self._category_hits(field, lambda v: v == value))
+
+    def contains_mask(self, field: str, term: str) -> "np.ndarray":
+        """Rows whose `field` (or any entry of a list field) contains `term`"""
+        term = fold(term)
+        return self._mask_for_codes(field, self._category_hits(field, lambda v: term in v))
+
+    def search_mask(self, term: str, fields: Iterable[str], mode: str = "substring") -> "np.ndarray":
+        """Rows where any of `fields` contains `term` (or matches it under another match mode)"""
+        mask = np.zeros(self.size, dtype=bool)
+        if mode == "substring":
+            for field in fields:
+                mask |= self.contains_mask(field, term)
+            return mask
+        _, accept = value_filter(term, mode)
+        for field in fields:
+            mask |= self._mask_for_codes(field, self._category_hits(field, accept))
+        return mask
+
+    def date_mask(self, start: Optional[str] = None, end: Optional[str] = None) -> "np.ndarray":
+        """Rows dated within [start, end] (ISO days); undated rows never match"""
+        mask = ~np.isnat(self.days)
+        if start is not None:
+            mask &= self.days >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= self.days <= np.datetime64(end, "D")
+        return mask
+
+    def to_bitmap(self, mask: "np.ndarray"):
+        if hasattr(self.bitmap_cls, "from_bytes"):
+            return self.bitmap_cls.from_bytes(np.packbits(mask, bitorder="little").tobytes())
+        return self.bitmap_cls.from_ids(np.flatnonzero(mask).tolist())
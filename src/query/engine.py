@@ -0,0 +1,993 @@
+import json
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.nlp.entity_extractor import MeetingEntityExtractor
+from src.nlp.metadata import CATEGORY_FIELDS, DEFAULT_ARTIFACT_PATH, derive_metadata, load_or_build
+from src.nlp.intent_classifier import IntentClassifier
+from src.nlp.date_parser import DateParser
+from src.nlp.boolean_parser import BooleanParser
+from src.query.index import InvertedIndex, EMAIL_SEARCH_FIELDS, CALENDAR_SEARCH_FIELDS
+from src.query.timeline import TimestampIndex
+from src.query.bitmap import Bitmap
+from src.query.fulltext import FullTextIndex, FULLTEXT_FIELDS, MATCH_MODES
+from src.query.normalize import fold, normalize_record
+from src.query.columnar import ColumnarStore
+from src.query.cache import QueryCache
+from src.query.planner import AnyOf, BooleanPredicate, DatePredicate, QueryPlan, TeamPredicate, TermPredicate
+from src.query.ranking import BM25Scorer, ResultCursor, ResultPage, EMAIL_RANK_FIELDS, CALENDAR_RANK_FIELDS, tokenize
+from src.query.instrumentation import Instrumentation, StageTrace, stage
+from src.query.nlp_cache import NLPCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMAILS_PATH = "Data/emails.json"
+DEFAULT_CALENDAR_PATH = "Data/calendar_events.json"
+DEFAULT_METADATA_PATH = "Data/metadata.json"
+
+# Words after "from" that are never a sender
+NON_PERSON_WORDS = ['hr', 'design', 'engineering', 'devops', 'legal', 'marketing', 'product', 'last', 'next', 'this']
+
+STOP_WORDS = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by", "from", "show", "me", "find", "get", "any", "all", "have", "do", "i", "my", "are", "is", "was", "were", "been", "be", "will", "would", "could", "should"}
+
+# Query words that say what to search rather than what to rank by
+RANK_IGNORED_WORDS = STOP_WORDS | set(IntentClassifier.EMAIL_KEYWORDS) | set(IntentClassifier.CALENDAR_KEYWORDS)
+
+# Match term prefixes and the field each one searches
+TERM_PREFIXES = {"from:": "sender", "to:": "recipients", "cc:": "cc"}
+
+# Distinct term results kept per data source across queries, bounded by count
+# and by the bytes of their bitmaps (a bitmap costs up to one bit per record)
+TERM_CACHE_SIZE = 4096
+TERM_CACHE_BYTES = 32 << 20
+
+DATE_RANGE_PATTERN = re.compile(r'\b(from|since)\s+\w+\s+\d{4}\s+(to|until)\s+\w+\s+\d{4}\b')
+
+boolean_parser = BooleanParser()
+
+
+class DataSource:
+    def __init__(self, kind: str, records: List[dict], columnar: bool = False, bitmap_cls=Bitmap):
+        """
+        One record collection (emails or calendar events) with its indexes.
+
+        Args:
+            kind: "email" or "calendar"
+            records: Records as loaded from JSON; ids are positions in this list
+            columnar: Also build a NumPy ColumnarStore for vectorized filters;
+                rows are still returned from `records`
+            bitmap_cls: Result set type every index returns (see `src.query.bitmap`)
+        """
+        self.kind = kind
+        self.records = records
+        self.search_fields = EMAIL_SEARCH_FIELDS if kind == "email" else CALENDAR_SEARCH_FIELDS
+        # Casefolded search fields, parallel to `records`; the index and
+        # record checks read these instead of lowercasing per query
+        self.normalized = [normalize_record(record, self.search_fields) for record in records]
+        self.timeline = TimestampIndex(records, bitmap_cls=bitmap_cls)
+        self.store = ColumnarStore(records, bitmap_cls=bitmap_cls) if columnar else None
+        self.scorer = BM25Scorer(records, EMAIL_RANK_FIELDS if kind == "email" else CALENDAR_RANK_FIELDS)
+
+        # Fields the columnar store answers with vectorized masks; the rest
+        # (subject, body, title, description) are the only ones the inverted
+        # index holds postings for
+        self.store_fields = [f for f in self.search_fields if self.store is not None and f in self.store.categories]
+        self.text_fields = [f for f in self.search_fields if f not in self.store_fields]
+        self.index = InvertedIndex(self.normalized, self.text_fields, bitmap_cls=bitmap_cls)
+
+        # Positional word index over the long text fields, for word, phrase
+        # and prefix match modes; other fields check their distinct values
+        self.fulltext_fields = [f for f in FULLTEXT_FIELDS if f in self.search_fields]
+        self.fulltext = FullTextIndex(records, self.fulltext_fields, bitmap_cls=bitmap_cls)
+        self.value_fields = [f for f in self.text_fields if f not in self.fulltext_fields]
+
+        # Term -> matching ids, shared by all queries until the data changes
+        self.term_cache = QueryCache(maxsize=TERM_CACHE_SIZE, ttl=None, maxbytes=TERM_CACHE_BYTES,
+                                     sizeof=lambda matches: matches.nbytes)
+
+        # Record id -> row, for upserts
+        self.id_rows: Dict[str, int] = {record["id"]: row for row, record in enumerate(records) if "id" in record}
+
+    def upsert(self, records: List[dict], append_new: bool = True) -> Dict[str, int]:
+        """
+        Add or replace records by `id`, updating every index in place.
+
+        Args:
+            records: New or changed records
+            append_new: Append records whose id is unknown here; when False
+                (e.g. on all but one shard) they are skipped
+
+        Returns:
+            Counts of "added", "updated" and "unchanged" records
+        """
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        appended = []
+        for record in records:
+            row = self.id_rows.get(record.get("id"))
+            if row is None:
+                if not append_new:
+                    continue
+                row = len(self.records)
+                self.records.append(record)
+                self.normalized.append(normalize_record(record, self.search_fields))
+                if "id" in record:
+                    self.id_rows[record["id"]] = row
+                appended.append(record)
+                counts["added"] += 1
+            else:
+                old = self.records[row]
+                if old == record:
+                    counts["unchanged"] += 1
+                    continue
+                self.records[row] = record
+                self.index.remove(row, self.normalized[row])
+                self.normalized[row] = normalize_record(record, self.search_fields)
+                self.timeline.remove(row, old)
+                self.scorer.remove(row, old)
+                self.fulltext.remove(row, old)
+                if self.store is not None:
+                    if row >= self.store.size:
+                        # Updated again within the same batch
+                        self.store.append(appended)
+                        appended = []
+                    self.store.replace(row, record)
+                counts["updated"] += 1
+            self.index.add(row, self.normalized[row])
+            self.timeline.add(row, record)
+            self.scorer.add(row, record)
+            self.fulltext.add(row, record)
+
+        if self.store is not None:
+            self.store.append(appended)
+        if counts["added"] or counts["updated"]:
+            self.term_cache.clear()
+        return counts
+
+    @property
+    def universe(self):
+        return self.index.universe
+
+    def field_match(self, field: str, term: str):
+        if field in self.store_fields:
+            return self.store.to_bitmap(self.store.contains_mask(field, term))
+        return self.index.lookup(field, term)
+
+    def term_fields(self, term: str):
+        """Fields a match term searches, and the text it looks for"""
+        for prefix, field in TERM_PREFIXES.items():
+            if term.startswith(prefix):
+                return [field], term.split(":", 1)[1]
+        return self.search_fields, term
+
+    def term_mode(self, term: str, mode: str) -> str:
+        # from:/to:/cc: person filters always match names as substrings
+        return "substring" if any(term.startswith(prefix) for prefix in TERM_PREFIXES) else mode
+
+    def estimate(self, term: str, mode: str = "substring") -> int:
+        """Upper bound on the size of `match(term, mode)`, from the index postings"""
+        if term == "__ALL__":
+            return self.index.size
+        fields, text = self.term_fields(term)
+        mode = self.term_mode(term, mode)
+        if mode == "substring":
+            count = self.index.estimate(text, fields)
+        else:
+            count = (self.fulltext.estimate(text, mode)
+                     + self.index.estimate(text, [f for f in fields if f not in self.fulltext_fields], mode))
+        store_fields = [f for f in fields if f in self.store_fields]
+        if store_fields:
+            count += self.store.estimate(text, store_fields, mode)
+        return count
+
+    def record_matches(self, row: int, term: str, mode: str = "substring") -> bool:
+        """Whether record `row` is in `match(term, mode)`, checked on the record itself"""
+        if term == "__ALL__":
+            return True
+        fields, text = self.term_fields(term)
+        return self.index.matches_record(self.normalized[row], text, fields, self.term_mode(term, mode))
+
+    def _cached(self, key, resolve):
+        matches = self.term_cache.get(key)
+        if matches is None:
+            matches = resolve()
+            self.term_cache.put(key, matches)
+        return matches
+
+    def match(self, term: str, mode: str = "substring"):
+        """
+        Resolve a `from:`/`to:`/`cc:`/free-text term (or `__ALL__`) to record ids.
+
+        `mode` (one of `MATCH_MODES`) selects how free-text terms match:
+        as substrings, whole words, a phrase or word prefixes.
+        """
+        if term == "__ALL__":
+            return self.universe
+        mode = self.term_mode(term, mode)
+        if mode != "substring":
+            return self._cached((mode, term), lambda: self._resolve_words(term, mode))
+        return self._cached(term, lambda: self._resolve(term))
+
+    def _resolve_words(self, term: str, mode: str):
+        matches = self.fulltext.search(term, mode)
+        if self.value_fields:
+            matches = matches | self.index.search(term, self.value_fields, mode)
+        if self.store_fields:
+            matches = matches | self.store.to_bitmap(self.store.search_mask(term, self.store_fields, mode))
+        return matches
+
+    def _resolve(self, term: str):
+
+        if term.startswith("from:"):
+            return self.field_match("sender", term.split(":", 1)[1])
+
+        elif term.startswith("to:"):
+            return self.field_match("recipients", term.split(":", 1)[1])
+
+        elif term.startswith("cc:"):
+            return self.field_match("cc", term.split(":", 1)[1])
+
+        matches = self.index.search(term, self.text_fields)
+        if self.store_fields:
+            matches |= self.store.to_bitmap(self.store.search_mask(term, self.store_fields))
+        return matches
+
+    def record_in_team(self, row: int, team: str) -> bool:
+        return self.normalized[row]["team"] == fold(team)
+
+    def team_count(self, team: str) -> int:
+        """Number of records in `team_matches(team)`"""
+        if self.store is not None:
+            return self.store.count_equal("team", team)
+        return self.index.count_exact("team", team)
+
+    def team_matches(self, team: str):
+        return self._cached(f"team={team}", lambda: self._resolve_team(team))
+
+    def _resolve_team(self, team: str):
+        if self.store is not None:
+            return self.store.to_bitmap(self.store.equals_mask("team", team))
+        return self.index.lookup_exact("team", team)
+
+    def date_matches(self, start: Optional[str], end: Optional[str]):
+        if self.store is not None:
+            return self.store.to_bitmap(self.store.date_mask(start, end))
+        return self.timeline.between(start, end)
+
+    def iter_rows(self, ids: Iterable[int]) -> Iterator[dict]:
+        return (self.records[i] for i in ids)
+
+    def rows(self, ids) -> List[dict]:
+        return list(self.iter_rows(ids))
+
+
+def date_bounds(date_info, query_lower: str):
+    """
+    Turn DateParser output into an inclusive (start, end) day range.
+
+    Returns None when the query has no date constraint; either bound may be
+    None for open-ended ranges.
+    """
+    if isinstance(date_info, tuple) and len(date_info) == 2:
+        return date_info
+    elif isinstance(date_info, list) and len(date_info) >= 2:
+        logger.debug("Applying date list filter: %s", date_info)
+        return date_info[0], date_info[-1]
+    elif isinstance(date_info, str) and date_info:
+        return date_info, date_info
+    elif isinstance(date_info, list) and len(date_info) == 1:
+        single_date = date_info[0]
+
+        # Check if this is a relative date query (last X days/weeks/months)
+        if any(word in query_lower for word in ["last", "past", "previous"]) and any(word in query_lower for word in ["days", "weeks", "months"]):
+            end_date = datetime.now().strftime('%Y-%m-%d')
+            logger.debug("Converting single date to range: %s to %s", single_date, end_date)
+            return single_date, end_date
+
+        # Regular single date match (exact date)
+        logger.debug("Applying exact single date filter: %s", single_date)
+        return single_date, single_date
+    return None
+
+
+def plan_query(source: DataSource, analysis: Dict, memo: Dict = None, instrumentation: Instrumentation = None) -> QueryPlan:
+    """
+    Build the filtering plan of a query against one data source.
+
+    Args:
+        source: Data source selected by the query intent
+        analysis: Output of `QueryEngine.analyze` (query, intent, entities, dates)
+        memo: Optional term -> result dict, e.g. shared by a batch of queries
+            on the same source; a fresh one is used per query when None.
+            Results also go through the source's cross-query term cache.
+        instrumentation: Optional stage timing the plan reports its steps to
+
+    Returns:
+        QueryPlan whose `run()` gives the matching record ids. Its `branch`
+        is "contextual" (from:/to:/cc: filters), "team_topic", "boolean",
+        "and_terms" or "unfiltered" (no search terms), and `fallback` is set
+        when the terms are query words left after dropping stopwords.
+    """
+    user_query = analysis["query"]
+    query_lower = analysis["query_lower"]
+    entities = analysis["entities"]
+    date_info = analysis["date_info"]
+
+    if memo is None:
+        memo = {}
+
+    # Misspelt names and the identities they resolve to, see `MeetingEntityExtractor.person_aliases`
+    aliases = analysis.get("people_aliases", {})
+
+    match_mode = analysis.get("match_mode", "substring")
+
+    # Each term is resolved once per query (the AND loop and the boolean
+    # expression often share words), and once per data version overall
+    def match_fn(term: str):
+        key = (term, match_mode)
+        if key not in memo:
+            memo[key] = source.match(term, match_mode)
+        return memo[key]
+
+    predicates = []
+    # The date range is one more predicate, ordered by its selectivity like the rest
+    bounds = date_bounds(date_info, query_lower)
+    if bounds is not None:
+        predicates.append(DatePredicate(source, *bounds))
+
+    def plan(branch: str, fallback: bool = False) -> QueryPlan:
+        return QueryPlan(predicates, source.universe, source.index.bitmap_cls, instrumentation,
+                         branch=branch, fallback=fallback)
+
+    search_terms = []
+    contextual_filters = {}
+    has_date_range_pattern = bool(DATE_RANGE_PATTERN.search(query_lower))
+
+    from_match = re.search(r'\bfrom\s+([a-zA-Z.]+)(?:\s+(?:to|until|since)\s+\w+\s+\d{4})?', query_lower)
+    if from_match and not has_date_range_pattern:
+        person = from_match.group(1)
+        if person.lower() not in NON_PERSON_WORDS:
+            matched_person = next((p for p in entities.get('people', []) if person.lower() in p.lower()),
+                                  aliases.get(person, person))
+            contextual_filters['from'] = matched_person
+    elif from_match and has_date_range_pattern:
+        person_match = re.search(r'\bfrom\s+([a-zA-Z.]+)(?=\s+(?:from|since))', query_lower)
+        if person_match:
+            person = person_match.group(1)
+            matched_person = next((p for p in entities.get('people', []) if person.lower() in p.lower()),
+                                  aliases.get(person, person))
+            contextual_filters['from'] = matched_person
+
+    to_match = re.search(r'\bto\s+([a-zA-Z.]+)(?!\s+\d{4})', query_lower)
+    if to_match and not has_date_range_pattern:
+        contextual_filters['to'] = aliases.get(to_match.group(1), to_match.group(1))
+
+    cc_match = re.search(r'\bcc\s+([a-zA-Z.]+)', query_lower)
+    if cc_match:
+        contextual_filters['cc'] = aliases.get(cc_match.group(1), cc_match.group(1))
+
+    if contextual_filters:
+        for filter_type, person in contextual_filters.items():
+            predicates.append(TermPredicate(source, f"{filter_type}:{person}", match_fn, match_mode))
+        return plan("contextual")
+
+    for entity_set in entities.values():
+        search_terms.extend(entity_set)
+
+    fallback = not search_terms
+    if fallback:
+        query_words = [w.strip(".,!?") for w in query_lower.split() if w.strip(".,!?") not in STOP_WORDS and len(w.strip(".,!?")) > 2]
+        search_terms.extend(query_words)
+
+    has_team = bool(entities.get('team'))
+    has_topic = bool(entities.get('topic'))
+
+    branch = "unfiltered"
+    if search_terms and has_team and has_topic:
+        branch = "team_topic"
+        empty = source.index.empty()
+        predicates.append(AnyOf("team", [TeamPredicate(source, team) for team in entities.get('team', [])], empty))
+        predicates.append(AnyOf("topic", [TermPredicate(source, term, match_fn, match_mode) for term in entities.get('topic', [])], empty))
+
+    elif search_terms:
+        postfix_expr = None
+        if any(op in query_lower for op in ["and", "or", "not"]):
+            try:
+                postfix_expr = boolean_parser.parse(user_query)
+                # Malformed expressions fall back to the AND of the terms
+                boolean_parser.evaluate(postfix_expr, lambda term: set(), universe=set())
+            except Exception:
+                postfix_expr = None
+
+        if postfix_expr is not None:
+            branch = "boolean"
+            predicates.append(BooleanPredicate(source, postfix_expr, boolean_parser.evaluate, match_fn, match_mode))
+        else:
+            branch = "and_terms"
+            for term in dict.fromkeys(search_terms):
+                predicates.append(TermPredicate(source, term, match_fn, match_mode))
+
+    return plan(branch, fallback and bool(search_terms))
+
+
+def match_ids(source: DataSource, analysis: Dict, memo: Dict = None, instrumentation: Instrumentation = None):
+    """
+    Run the filtering stage of a query against one data source.
+
+    Args:
+        source: Data source selected by the query intent
+        analysis: Output of `QueryEngine.analyze` (query, intent, entities, dates)
+        memo: Optional term -> result dict, see `plan_query`
+        instrumentation: Optional stage timing, see `plan_query`
+
+    Returns:
+        Bitmap of matching record ids
+    """
+    return plan_query(source, analysis, memo=memo, instrumentation=instrumentation).run()
+
+
+def rank_tokens(query_lower: str) -> List[str]:
+    """Query tokens used for relevance scoring"""
+    return [token for token in tokenize(query_lower) if token not in RANK_IGNORED_WORDS]
+
+
+def ranked_rows(source: DataSource, analysis: Dict, memo: Dict = None, limit: Optional[int] = None,
+                offset: int = 0, instrumentation: Instrumentation = None,
+                statistics: Dict = None) -> Tuple[int, List[Tuple[float, dict]]]:
+    """
+    Match a query against one data source and return a ranked page.
+
+    Args:
+        source: Data source selected by the query intent
+        analysis: Output of `QueryEngine.analyze`
+        memo: Optional term -> result dict, see `match_ids`
+        limit: Page size (None for every match)
+        offset: Number of top results to skip
+        instrumentation: Optional stage timing for matching, ranking and fetching
+        statistics: BM25 corpus statistics to rank with instead of the
+            source's own, see `BM25Scorer.scores`
+
+    Returns:
+        (total matches, [(score, record)] best first)
+    """
+    ids = match_ids(source, analysis, memo=memo, instrumentation=instrumentation)
+    return rank_page(source, ids, analysis, limit=limit, offset=offset, instrumentation=instrumentation,
+                     statistics=statistics)
+
+
+def rank_page(source: DataSource, ids, analysis: Dict, limit: Optional[int] = None, offset: int = 0,
+              instrumentation: Instrumentation = None, statistics: Dict = None) -> Tuple[int, List[Tuple[float, dict]]]:
+    """Rank matched record ids and fetch a page of records, see `ranked_rows`"""
+    with stage(instrumentation, "rank", rows_in=len(ids)) as info:
+        ranked = source.scorer.top_k(ids, analysis["rank_tokens"], limit=limit, offset=offset,
+                                     statistics=statistics)
+        info["rows_out"] = len(ranked)
+    with stage(instrumentation, "fetch", rows=len(ranked)):
+        records = source.rows(i for _, i in ranked)
+    return len(ids), list(zip([score for score, _ in ranked], records))
+
+
+def explain_rows(source: DataSource, analysis: Dict, limit: Optional[int] = None, offset: int = 0,
+                 statistics: Dict = None) -> Tuple[int, List[Tuple[float, dict]], List[Dict]]:
+    """
+    Like `ranked_rows`, also describing how the query ran.
+
+    Returns:
+        (total matches, [(score, record)] best first, plan nodes): the filter
+        plan (see `QueryPlan.explain`) followed by the rank and fetch stages
+    """
+    trace = StageTrace()
+    instrumentation = Instrumentation()
+    instrumentation.add_hook(trace)
+    plan = plan_query(source, analysis)
+    ids = plan.run()
+    total, ranked = rank_page(source, ids, analysis, limit=limit, offset=offset, instrumentation=instrumentation,
+                              statistics=statistics)
+    return total, ranked, [plan.explain()] + trace.nodes
+
+
+def source_kind(intent: str) -> str:
+    """Data source a query intent searches ("ambiguous" and "unknown" use the calendar)"""
+    return "email" if intent == "email" else "calendar"
+
+
+class QueryEngine:
+    def __init__(self, emails_path: str = DEFAULT_EMAILS_PATH,
+                 calendar_path: str = DEFAULT_CALENDAR_PATH,
+                 metadata_path: str = DEFAULT_METADATA_PATH,
+                 columnar: bool = False,
+                 cache_size: int = 256,
+                 cache_ttl: float = 300.0,
+                 extraction_tier: str = "auto",
+                 metadata_artifact: Optional[str] = DEFAULT_ARTIFACT_PATH,
+                 nlp_cache_path: Optional[str] = None,
+                 bitmap_cls=Bitmap):
+        """
+        Query pipeline over the email and calendar data.
+
+        Nothing is loaded at construction: data sources, indexes, the spaCy
+        model and dateparser are created on first use, or up front with
+        `warmup()`.
+
+        Args:
+            emails_path: Path to the emails JSON file
+            calendar_path: Path to the calendar events JSON file
+            metadata_path: Path to metadata.json used for entity matching
+            columnar: Build NumPy columnar stores (requires numpy)
+            cache_size: Maximum number of cached query results (0 disables the cache)
+            cache_ttl: Seconds a cached result stays valid
+            extraction_tier: When entity extraction runs spaCy NER, one of
+                `EXTRACTION_TIERS` ("auto" by default)
+            metadata_artifact: Compiled metadata file (see `src.nlp.metadata`),
+                rebuilt from the data and metadata.json when they change;
+                None builds the extractor from metadata.json on every start
+            nlp_cache_path: Optional SQLite file caching entity and date
+                results across processes and restarts (see `NLPCache`)
+            bitmap_cls: Result set type of the indexes (see `src.query.bitmap`)
+        """
+        self.emails_path = emails_path
+        self.calendar_path = calendar_path
+        self.metadata_path = metadata_path
+        self.columnar = columnar
+        self.extraction_tier = extraction_tier
+        self.metadata_artifact = metadata_artifact
+        self.nlp_cache_path = nlp_cache_path
+        self._nlp_cache = None
+        self.bitmap_cls = bitmap_cls
+        self.classifier = IntentClassifier()
+
+        self._sources: Dict[str, DataSource] = {}
+        self._entity_extractor = None
+        self._date_parser = None
+
+        # Bumped whenever the data is (re)loaded or changed; part of every cache key
+        self.data_version = 0
+        self.cache = QueryCache(maxsize=cache_size, ttl=cache_ttl)
+        # Held while matching runs and while ingestion updates the indexes
+        self._data_lock = threading.RLock()
+        # Per-stage timings, metrics and hooks
+        self.instrumentation = Instrumentation()
+
+    def _read_records(self, kind: str) -> List[dict]:
+        path = self.emails_path if kind == "email" else self.calendar_path
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load_source(self, kind: str) -> DataSource:
+        return DataSource(kind, self._read_records(kind), columnar=self.columnar, bitmap_cls=self.bitmap_cls)
+
+    def _load_all_sources(self) -> None:
+        self.source("email")
+        self.source("calendar")
+
+    def source(self, kind: str) -> DataSource:
+        """Data source for "email" or "calendar", loaded and indexed on first use"""
+        source = self._sources.get(kind)
+        if source is None:
+            # Loaded once even when several threads ask at the same time
+            with self._data_lock:
+                if kind not in self._sources:
+                    self._sources[kind] = self._load_source(kind)
+                source = self._sources[kind]
+        return source
+
+    def reload(self) -> None:
+        """
+        Drop loaded data so the files are read again, invalidating cached
+        results. Entity metadata is recompiled if the files changed.
+        """
+        with self._data_lock:
+            self._sources.clear()
+            if self._entity_extractor is not None and self.metadata_artifact:
+                self._entity_extractor.use_tables(self._compiled_metadata())
+            self._data_changed()
+
+    def _data_changed(self) -> None:
+        self.data_version += 1
+        self.cache.clear()
+
+    def ingest(self, kind: str, records: List[dict]) -> Dict[str, int]:
+        """
+        Add or upsert (by `id`) email or calendar records without reloading.
+
+        Indexes are updated incrementally. Queries already matching finish on
+        the data they started with; the update is applied as soon as they
+        are done. Cached results are invalidated. With a metadata artifact,
+        people, teams, topics, meeting types and locations first seen in
+        `records` are added to the entity extractor's tables; with
+        `metadata_artifact=None` the extractor only knows `metadata.json`.
+
+        Args:
+            kind: "email" or "calendar"
+            records: New or changed records
+
+        Returns:
+            Counts of "added", "updated" and "unchanged" records
+        """
+        with self._data_lock:
+            counts = self.source(kind).upsert(records)
+            if counts["added"] or counts["updated"]:
+                self._learn_entities(records)
+                self._data_changed()
+        return counts
+
+    def _learn_entities(self, records: List[dict]) -> None:
+        """Add entity values first seen in `records` to the extractor's tables (artifact mode only)"""
+        if not self.metadata_artifact:
+            return
+        extractor = self.entity_extractor
+        metadata = derive_metadata(records, base=extractor.metadata)
+        if all(metadata[category] == extractor.metadata[category] for category in CATEGORY_FIELDS):
+            return
+        # Known values keep their counts; new ones are counted from `records`
+        frequencies = extractor.metadata.get("frequencies", {})
+        metadata["frequencies"] = {category: {**counts, **frequencies.get(category, {})}
+                                   for category, counts in metadata["frequencies"].items()}
+        extractor.use_metadata(metadata)
+
+    def source_for_intent(self, intent: str) -> DataSource:
+        return self.source(source_kind(intent))
+
+    @property
+    def entity_extractor(self) -> MeetingEntityExtractor:
+        if self._entity_extractor is None:
+            if self.metadata_artifact:
+                self._entity_extractor = MeetingEntityExtractor(compiled=self._compiled_metadata(),
+                                                                tier=self.extraction_tier)
+            else:
+                self._entity_extractor = MeetingEntityExtractor(metadata_file_path=self.metadata_path,
+                                                                tier=self.extraction_tier)
+        return self._entity_extractor
+
+    def _compiled_metadata(self) -> Dict:
+        """Extractor tables from the metadata artifact, rebuilt if the data changed"""
+        artifact = load_or_build(self.metadata_artifact, [self.emails_path, self.calendar_path], self.metadata_path)
+        return artifact["tables"]
+
+    @property
+    def nlp_cache(self) -> Optional[NLPCache]:
+        """Persistent entity and date cache, opened on first use (None when disabled)"""
+        if self._nlp_cache is None and self.nlp_cache_path:
+            self._nlp_cache = NLPCache(self.nlp_cache_path)
+        return self._nlp_cache
+
+    @property
+    def date_parser(self) -> DateParser:
+        if self._date_parser is None:
+            self._date_parser = DateParser()
+        return self._date_parser
+
+    def reference_day(self) -> str:
+        """
+        Today's date in ISO form. When the day has changed since the
+        DateParser's reference was set, the reference moves to now, so
+        relative dates in a long-running process follow the calendar.
+        """
+        today = date.today()
+        if self.date_parser.reference.date() != today:
+            self.date_parser.set_reference(datetime.now())
+        return today.isoformat()
+
+    def warmup(self) -> float:
+        """
+        Load data, indexes and NLP models now instead of on the first query.
+
+        Returns:
+            Seconds spent warming up
+        """
+        start = time.perf_counter()
+        self._load_all_sources()
+        self.entity_extractor.warmup()
+        self.date_parser.warmup()
+        return time.perf_counter() - start
+
+    def classify_intent(self, user_query: str) -> str:
+        return self.classifier.classify_intent(user_query)
+
+    def analyze(self, user_query: str, entities: Dict = None, match_mode: str = "substring",
+                instrumentation: Instrumentation = None, people_aliases: Dict[str, str] = None) -> Dict:
+        """
+        Run the NLP stages: intent, entities and dates.
+
+        Args:
+            user_query: Query text
+            entities: Entities already extracted for this query (e.g. by a
+                batched `nlp.pipe` run); extracted here when None
+            match_mode: How free-text terms match, one of `MATCH_MODES`
+            instrumentation: Stage timing to report to instead of the engine's
+            people_aliases: Misspelt-name aliases that came with `entities`
+        """
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"match_mode must be one of {MATCH_MODES}")
+        instrumentation = instrumentation or self.instrumentation
+        query_lower = user_query.lower()
+        with instrumentation.stage("intent") as info:
+            intent = info["intent"] = self.classify_intent(user_query)
+        logger.info("Intent classified as: %s for query: %s", intent, user_query)
+
+        if entities is None:
+            with instrumentation.stage("entities") as info:
+                entities, people_aliases, info["cached"] = self._extract_entities(user_query)
+                info["count"] = sum(len(values) for values in entities.values())
+        elif people_aliases is None:
+            people_aliases = self.entity_extractor.person_aliases(user_query)
+        logger.debug("Extracted entities: %s", entities)
+        if people_aliases:
+            logger.debug("Resolved misspelt names: %s", people_aliases)
+
+        with instrumentation.stage("dates") as info:
+            date_info, info["cached"] = self._parse_dates(user_query, query_lower)
+            info["found"] = bool(date_info)
+        logger.debug("Parsed date info: %s", date_info)
+
+        return {
+            "query": user_query,
+            "query_lower": query_lower,
+            "intent": intent,
+            "entities": entities,
+            "date_info": date_info,
+            "people_aliases": people_aliases,
+            "rank_tokens": rank_tokens(query_lower),
+            "match_mode": match_mode,
+        }
+
+    def _extract_entities(self, user_query: str) -> Tuple[Dict, Dict[str, str], bool]:
+        """Entities and misspelt-name aliases of a query, and whether they came from the NLP cache"""
+        cached = self._cached_entities(user_query)
+        if cached is not None:
+            return cached + (True,)
+        entities, people_aliases = self.entity_extractor.extract_with_aliases(user_query)
+        self._store_entities(user_query, entities, people_aliases)
+        return entities, people_aliases, False
+
+    def _entities_key(self, user_query: str) -> List[str]:
+        return [normalize_text(user_query), self.entity_extractor.cache_version()]
+
+    def _cached_entities(self, user_query: str) -> Optional[Tuple[Dict, Dict[str, str]]]:
+        """Entities and aliases of a query from the NLP cache, or None"""
+        cache = self.nlp_cache
+        if cache is None:
+            return None
+        cached = cache.get("entities", self._entities_key(user_query))
+        if cached is None:
+            return None
+        return {kind: set(values) for kind, values in cached["entities"].items()}, cached["aliases"]
+
+    def _store_entities(self, user_query: str, entities: Dict, people_aliases: Dict[str, str]) -> None:
+        cache = self.nlp_cache
+        if cache is not None:
+            cache.put("entities", self._entities_key(user_query),
+                      {"entities": {kind: sorted(values) for kind, values in entities.items()},
+                       "aliases": people_aliases})
+
+    def _parse_dates(self, user_query: str, query_lower: str) -> Tuple[object, bool]:
+        """DateParser output for a query, and whether it came from the NLP cache"""
+        reference_day = self.reference_day()
+        # The rule grammar answers faster than a cache lookup would
+        date_info = self.date_parser.rule_dates(user_query)
+        if date_info is not None:
+            return date_info, False
+
+        cache = self.nlp_cache
+        if cache is not None:
+            # Relative dates depend on the reference day
+            key = [normalize_text(user_query), reference_day, self.date_parser.cache_version()]
+            cached = cache.get("dates", key)
+            if cached is not None:
+                # JSON has no tuples, so (start, end) ranges are flagged
+                dates = cached["dates"]
+                return (tuple(dates) if cached["range"] else dates), True
+
+        date_info = self.date_parser.fallback_dates(user_query)
+
+        if isinstance(date_info, str) and DATE_RANGE_PATTERN.search(query_lower):
+            all_dates = self.date_parser.extract_all_dates(user_query)
+            if len(all_dates) >= 2:
+                date_info = all_dates
+        if cache is not None:
+            cache.put("dates", key, {"dates": date_info, "range": isinstance(date_info, tuple)})
+        return date_info, False
+
+    def execute(self, analysis: Dict, memo: Dict = None, limit: Optional[int] = None,
+                offset: int = 0) -> ResultPage:
+        """Run the matching and ranking stages for an analyzed query and return a page of records"""
+        with self._data_lock:
+            source = self.source_for_intent(analysis["intent"])
+            total, ranked = ranked_rows(source, analysis, memo=memo, limit=limit, offset=offset,
+                                        instrumentation=self.instrumentation)
+        return ResultPage((record for _, record in ranked), total=total)
+
+    def execute_iter(self, analysis: Dict, limit: Optional[int] = None, offset: int = 0) -> ResultCursor:
+        """
+        Like `execute`, but records are built as the returned cursor is read.
+
+        Matching runs up front so `total` is known immediately. Records that
+        are not read yet reflect updates ingested in the meantime.
+        """
+        with self._data_lock:
+            source = self.source_for_intent(analysis["intent"])
+            ids = match_ids(source, analysis, instrumentation=self.instrumentation)
+            with self.instrumentation.stage("rank", rows_in=len(ids)):
+                ranked = source.scorer.ranked_ids(ids, analysis["rank_tokens"], limit=limit, offset=offset)
+            total = len(ids)
+        return ResultCursor(source.iter_rows(ranked), total=total)
+
+    def execute_explain(self, analysis: Dict, limit: Optional[int] = None,
+                        offset: int = 0) -> Tuple[ResultPage, List[Dict]]:
+        """Like `execute`, also returning plan nodes for the filtering, ranking and fetching stages"""
+        with self._data_lock:
+            source = self.source_for_intent(analysis["intent"])
+            total, ranked, nodes = explain_rows(source, analysis, limit=limit, offset=offset)
+        return ResultPage((record for _, record in ranked), total=total), nodes
+
+    def explain(self, user_query: str, limit: Optional[int] = None, offset: int = 0,
+                match_mode: str = "substring") -> ResultPage:
+        """
+        Run a query uncached and attach how it ran as `plan` on the results.
+
+        The plan is a tree of nodes, each with its `stage`, `seconds` and
+        stage details: the intent, entities and dates stages, then the filter
+        plan with the branch taken and one child per predicate (estimate,
+        rows in and out, whether it was resolved through an index or verified
+        record by record), then ranking and fetching. The root also holds the
+        detected intent, entities and date interpretation.
+        """
+        trace = StageTrace()
+        instrumentation = Instrumentation()
+        instrumentation.add_hook(trace)
+        start = time.perf_counter()
+        analysis = self.analyze(user_query, match_mode=match_mode, instrumentation=instrumentation)
+        results, nodes = self.execute_explain(analysis, limit=limit, offset=offset)
+        bounds = date_bounds(analysis["date_info"], analysis["query_lower"])
+        results.plan = {
+            "stage": "query",
+            "query": user_query,
+            "intent": analysis["intent"],
+            "source": source_kind(analysis["intent"]),
+            "match_mode": match_mode,
+            "entities": {kind: sorted(values) for kind, values in analysis["entities"].items()},
+            "dates": {"parsed": analysis["date_info"], "range": list(bounds) if bounds else None},
+            "total": results.total,
+            "seconds": time.perf_counter() - start,
+            "children": trace.nodes + nodes,
+        }
+        return results
+
+    def execute_many(self, analyses: List[Dict], limit: Optional[int] = None,
+                     offset: int = 0) -> List[ResultPage]:
+        """Run the matching stage for many queries, sharing term results per source"""
+        memos: Dict[str, Dict] = {}
+        return [self.execute(analysis, memo=memos.setdefault(source_kind(analysis["intent"]), {}),
+                             limit=limit, offset=offset)
+                for analysis in analyses]
+
+    def cache_key(self, user_query: str, limit: Optional[int] = None, offset: int = 0,
+                  match_mode: str = "substring") -> tuple:
+        """
+        Cache key for a query.
+
+        Whitespace is normalized but case is kept, since spaCy NER is case
+        sensitive. Today's date is included because relative dates change
+        meaning at midnight, and the data version because results go stale
+        when the data is reloaded.
+        """
+        normalized = " ".join(user_query.split())
+        return (normalized, self.reference_day(), self.data_version,
+                limit, offset, match_mode)
+
+    def process_query(self, user_query: str, use_cache: bool = True, limit: Optional[int] = None,
+                      offset: int = 0, match_mode: str = "substring", explain: bool = False) -> ResultPage:
+        """
+        Answer a query with its matching records, most relevant first.
+
+        Args:
+            user_query: Query text
+            use_cache: Read from and fill the result cache
+            limit: Page size (None for every match)
+            offset: Number of top results to skip
+            match_mode: How free-text terms match: "substring" (default),
+                "word", "phrase" or "prefix"
+            explain: Bypass the cache and attach the executed plan as
+                `results.plan` (see `explain`)
+
+        Returns:
+            A ResultPage; `total` is the number of matches across all pages
+        """
+        if not user_query or not user_query.strip():
+            return ResultPage()
+        if explain:
+            return self.explain(user_query, limit=limit, offset=offset, match_mode=match_mode)
+
+        key = self.cache_key(user_query, limit, offset, match_mode) if use_cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ResultPage(cached, total=cached.total)
+
+        results = self.execute(self.analyze(user_query, match_mode=match_mode), limit=limit, offset=offset)
+
+        if key is not None:
+            self.cache.put(key, results)
+        return ResultPage(results, total=results.total)
+
+    def stream_query(self, user_query: str, use_cache: bool = True, limit: Optional[int] = None,
+                     offset: int = 0, match_mode: str = "substring") -> ResultCursor:
+        """
+        Answer a query with a cursor that produces records as it is read.
+
+        Takes the same arguments as `process_query`. A cached page is served
+        from the cache; otherwise nothing is cached, since the results are
+        never held in full.
+        """
+        if not user_query or not user_query.strip():
+            return ResultCursor()
+
+        if use_cache:
+            cached = self.cache.get(self.cache_key(user_query, limit, offset, match_mode))
+            if cached is not None:
+                return ResultCursor(cached, total=cached.total)
+
+        return self.execute_iter(self.analyze(user_query, match_mode=match_mode), limit=limit, offset=offset)
+
+    def process_queries(self, queries: List[str], batch_size: int = 64, n_process: int = 1,
+                        use_cache: bool = True, limit: Optional[int] = None,
+                        offset: int = 0, match_mode: str = "substring") -> List[ResultPage]:
+        """
+        Run many queries at once.
+
+        Duplicate queries are analyzed once, entity extraction for all of them
+        is batched through spaCy's `nlp.pipe`, and every distinct search term is
+        resolved once per source and shared by all queries that use it.
+
+        Args:
+            queries: Query texts
+            batch_size: spaCy `nlp.pipe` batch size
+            n_process: spaCy `nlp.pipe` process count
+            use_cache: Read from and fill the result cache
+            limit: Page size per query (None for every match)
+            offset: Number of top results to skip per query
+            match_mode: How free-text terms match, see `process_query`
+
+        Returns:
+            One ResultPage per query, in input order
+        """
+        results: Dict[str, ResultPage] = {}
+        pending = []
+        for user_query in dict.fromkeys(queries):
+            if not user_query or not user_query.strip():
+                results[user_query] = ResultPage()
+                continue
+            if use_cache:
+                cached = self.cache.get(self.cache_key(user_query, limit, offset, match_mode))
+                if cached is not None:
+                    results[user_query] = cached
+                    continue
+            pending.append(user_query)
+
+        with self.instrumentation.stage("entities", queries=len(pending)) as info:
+            # Queries seen before, by any process sharing the NLP cache, skip extraction
+            extracted = {}
+            for user_query in pending:
+                cached = self._cached_entities(user_query)
+                if cached is not None:
+                    extracted[user_query] = cached
+            misses = [user_query for user_query in pending if user_query not in extracted]
+            info["cached"] = len(extracted)
+            batch_entities = self.entity_extractor.extract_batch_with_aliases(
+                misses, batch_size=batch_size, n_process=n_process) if misses else []
+            for user_query, (entities, aliases) in zip(misses, batch_entities):
+                extracted[user_query] = entities, aliases
+                self._store_entities(user_query, entities, aliases)
+
+        analyses = [self.analyze(user_query, entities=extracted[user_query][0], match_mode=match_mode,
+                                 people_aliases=extracted[user_query][1])
+                    for user_query in pending]
+        for user_query, rows in zip(pending, self.execute_many(analyses, limit=limit, offset=offset)):
+            results[user_query] = rows
+            if use_cache:
+                self.cache.put(self.cache_key(user_query, limit, offset, match_mode), rows)
+
+        return [ResultPage(results[user_query], total=results[user_query].total) for user_query in queries]
@@ -0,0 +1,165 @@
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.query.bitmap import Bitmap
+from src.query.normalize import fold
+from src.query.ranking import tokenize
+
+# How a free-text term is matched against field text
+MATCH_MODES = ["substring", "word", "phrase", "prefix"]
+
+# Long text fields held in the positional index
+FULLTEXT_FIELDS = ["subject", "body", "title", "description"]
+
+
+def text_matches(text: str, term: str, mode: str) -> bool:
+    """
+    Whether `text` matches `term` under a match mode.
+
+    "word": every word of the term is a whole word of the text;
+    "prefix": every word of the term starts a word of the text;
+    "phrase": the words of the term appear consecutively, in order;
+    "substring": plain case-insensitive substring.
+    """
+    if mode == "substring":
+        return fold(term) in fold(text)
+    words = tokenize(term)
+    if not words:
+        return False
+    tokens = tokenize(text)
+    if mode == "word":
+        present = set(tokens)
+        return all(word in present for word in words)
+    if mode == "prefix":
+        return all(any(token.startswith(word) for token in tokens) for word in words)
+    width = len(words)
+    return any(tokens[i:i + width] == words for i in range(len(tokens) - width + 1))
+
+
+def value_filter(term: str, mode: str) -> Tuple[str, Callable[[str], bool]]:
+    """
+    Key and test for matching short field values (names, teams, topics).
+
+    Every mode needs the longest word of the term somewhere in the value, so
+    that word can prune candidates through the trigram index first.
+    """
+    term = fold(term)
+    if mode == "substring":
+        return term, lambda value: term in value
+    key = max(tokenize(term), key=len, default="")
+    return key, lambda value: key in value and text_matches(value, term, mode)
+
+
+class FullTextIndex:
+    def __init__(self, records: List[dict], fields: Iterable[str], bitmap_cls=Bitmap):
+        """
+        Positional index of the words in long text fields.
+
+        Each field maps a word to the records holding it and the word's
+        positions there, so word, prefix and phrase lookups cost time in the
+        posting lists they touch rather than in the size of the text. A sorted
+        vocabulary per field serves prefix lookups.
+
+        Args:
+            records: Records to index; ids are positions in this list
+            fields: Text field names to index
+            bitmap_cls: Result set type (see `src.query.bitmap`)
+        """
+        self.fields = list(fields)
+        self.bitmap_cls = bitmap_cls
+        # field -> word -> record id -> positions
+        self.postings: Dict[str, Dict[str, Dict[int, List[int]]]] = {field: {} for field in self.fields}
+        # field -> sorted distinct words
+        self.vocabulary: Dict[str, List[str]] = {field: [] for field in self.fields}
+
+        for record_id, record in enumerate(records):
+            self.add(record_id, record)
+
+    def add(self, record_id: int, record: dict) -> None:
+        for field in self.fields:
+            postings = self.postings[field]
+            for position, word in enumerate(tokenize(record.get(field) or "")):
+                if word not in postings:
+                    postings[word] = {}
+                    insort(self.vocabulary[field], word)
+                postings[word].setdefault(record_id, []).append(position)
+
+    def remove(self, record_id: int, record: dict) -> None:
+        for field in self.fields:
+            postings = self.postings[field]
+            for word in set(tokenize(record.get(field) or "")):
+                ids = postings.get(word)
+                if ids is None:
+                    continue
+                ids.pop(record_id, None)
+                if not ids:
+                    del postings[word]
+                    vocabulary = self.vocabulary[field]
+                    del vocabulary[bisect_left(vocabulary, word)]
+
+    def _prefixed(self, field: str, prefix: str) -> List[str]:
+        vocabulary = self.vocabulary[field]
+        start = bisect_left(vocabulary, prefix)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(prefix):
+            end += 1
+        return vocabulary[start:end]
+
+    def _word_ids(self, field: str, word: str, prefix: bool) -> set:
+        postings = self.postings[field]
+        if not prefix:
+            return set(postings.get(word, ()))
+        ids = set()
+        for match in self._prefixed(field, word):
+            ids.update(postings[match])
+        return ids
+
+    def _field_ids(self, field: str, words: List[str], mode: str) -> set:
+        id_sets = sorted((self._word_ids(field, word, mode == "prefix") for word in words), key=len)
+        ids = id_sets[0]
+        for other in id_sets[1:]:
+            if not ids:
+                break
+            ids = ids & other
+        if mode != "phrase" or len(words) < 2 or not ids:
+            return ids
+
+        postings = self.postings[field]
+        matched = set()
+        for record_id in ids:
+            starts = set(postings[words[0]][record_id])
+            for offset, word in enumerate(words[1:], 1):
+                positions = postings[word][record_id]
+                starts &= {position - offset for position in positions}
+                if not starts:
+                    break
+            if starts:
+                matched.add(record_id)
+        return matched
+
+    def search(self, term: str, mode: str, fields: Optional[Iterable[str]] = None):
+        """
+        Records where any of `fields` (all indexed fields by default) matches
+        `term` as words, a phrase or word prefixes (see `text_matches`).
+        """
+        words = tokenize(term)
+        ids = set()
+        if words:
+            for field in (self.fields if fields is None else fields):
+                ids |= self._field_ids(field, words, mode)
+        return self.bitmap_cls.from_ids(ids)
+
+    def estimate(self, term: str, mode: str, fields: Optional[Iterable[str]] = None) -> int:
+        """Upper bound on the size of `search(term, mode, fields)`"""
+        words = tokenize(term)
+        if not words:
+            return 0
+        total = 0
+        for field in (self.fields if fields is None else fields):
+            postings = self.postings[field]
+            if mode == "prefix":
+                sizes = [sum(len(postings[match]) for match in self._prefixed(field, word)) for word in words]
+            else:
+                sizes = [len(postings.get(word, ())) for word in words]
+            total += min(sizes)
+        return total
@@ -0,0 +1,190 @@
+from bisect import bisect_left
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+from src.query.bitmap import Bitmap
+from src.query.fulltext import text_matches, value_filter
+from src.query.normalize import fold
+
+
+# Fields searched by free-text terms, per source
+EMAIL_SEARCH_FIELDS = ["sender", "recipients", "cc", "subject", "topic", "team", "body"]
+CALENDAR_SEARCH_FIELDS = ["attendees", "title", "description", "topic", "team", "location"]
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class InvertedIndex:
+    def __init__(self, records: List[dict], fields: Iterable[str], bitmap_cls=Bitmap):
+        """
+        Build a field-aware inverted index over a list of records.
+
+        Each field maps its distinct casefolded values to the sorted ids of the
+        records holding them. A trigram index over those distinct values lets
+        substring lookups verify only the values that can possibly contain the
+        term, so results keep the case-insensitive `term in value` semantics
+        of a linear scan. Lookups return `bitmap_cls` result sets.
+
+        Args:
+            records: Records as built by `src.query.normalize.normalize_record`;
+                ids are positions in this list
+            fields: Field names to index (string or list-of-string fields)
+            bitmap_cls: Result set type (see `src.query.bitmap`)
+        """
+        self.size = len(records)
+        self.fields = list(fields)
+        self.bitmap_cls = bitmap_cls
+        # field -> casefolded value -> sorted record ids
+        self.postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in self.fields}
+        # field -> trigram -> distinct values containing it
+        self.grams: Dict[str, Dict[str, Set[str]]] = {field: {} for field in self.fields}
+        # (field, trigram or "") -> records holding a value with that trigram
+        # (any value for ""); planner statistics, dropped whenever records change
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+        for record_id, record in enumerate(records):
+            self._add_record(record_id, record)
+
+        self.universe = bitmap_cls.full(self.size)
+
+    def _field_values(self, record: dict, field: str) -> Iterable[str]:
+        value = record.get(field, "")
+        return value if isinstance(value, frozenset) else (value,)
+
+    def _add_record(self, record_id: int, record: dict) -> None:
+        for field in self.fields:
+            for value in self._field_values(record, field):
+                self._add_value(field, value, record_id)
+
+    def add(self, record_id: int, record: dict) -> None:
+        """Index a record under `record_id` (a new id, or one freed by `remove`)"""
+        self._counts.clear()
+        self._add_record(record_id, record)
+        if record_id >= self.size:
+            self.size = record_id + 1
+            self.universe = self.bitmap_cls.full(self.size)
+
+    def remove(self, record_id: int, record: dict) -> None:
+        """Drop `record`, previously indexed under `record_id`, from the postings"""
+        self._counts.clear()
+        for field in self.fields:
+            postings = self.postings[field]
+            for value in self._field_values(record, field):
+                ids = postings.get(value)
+                if not ids:
+                    continue
+                pos = bisect_left(ids, record_id)
+                if pos < len(ids) and ids[pos] == record_id:
+                    del ids[pos]
+                if not ids:
+                    del postings[value]
+                    grams = self.grams[field]
+                    for gram in _trigrams(value):
+                        values = grams.get(gram)
+                        if values is not None:
+                            values.discard(value)
+                            if not values:
+                                del grams[gram]
+
+    def _add_value(self, field: str, value: str, record_id: int) -> None:
+        postings = self.postings[field]
+        if value not in postings:
+            postings[value] = []
+            grams = self.grams[field]
+            for gram in _trigrams(value):
+                grams.setdefault(gram, set()).add(value)
+        ids = postings[value]
+        if not ids or ids[-1] < record_id:
+            ids.append(record_id)
+        else:
+            pos = bisect_left(ids, record_id)
+            if pos == len(ids) or ids[pos] != record_id:
+                ids.insert(pos, record_id)
+
+    def _candidate_values(self, field: str, term: str) -> Iterable[str]:
+        """Distinct values of a field that may contain `term` as a substring"""
+        if len(term) < 3:
+            return self.postings[field].keys()
+
+        grams = self.grams[field]
+        gram_sets = []
+        for gram in _trigrams(term):
+            values = grams.get(gram)
+            if not values:
+                return ()
+            gram_sets.append(values)
+        gram_sets.sort(key=len)
+        return set.intersection(*gram_sets)
+
+    def _matching_postings(self, field: str, term: str, accept=None) -> List[List[int]]:
+        """
+        Postings of the values of `field` containing `term`, or, with
+        `accept`, of those candidate values that pass `accept(value)`
+        """
+        postings = self.postings.get(field)
+        if postings is None:
+            # Not a field of this source (e.g. `sender` on calendar events)
+            return []
+        if accept is None:
+            return [postings[value] for value in self._candidate_values(field, term) if term in value]
+        return [postings[value] for value in self._candidate_values(field, term) if accept(value)]
+
+    def _gram_count(self, field: str, gram: str) -> int:
+        count = self._counts.get((field, gram))
+        if count is None:
+            postings = self.postings[field]
+            values = self.grams[field].get(gram, ()) if gram else postings.keys()
+            count = self._counts[field, gram] = sum(len(postings[value]) for value in values)
+        return count
+
+    def estimate(self, term: str, fields: Iterable[str], mode: str = "substring") -> int:
+        """
+        Upper bound on the size of `search(term, fields, mode)`.
+
+        A value containing the term contains each of its trigrams, so per
+        field the least frequent trigram bounds the matches. Trigram counts
+        are computed once and kept until the records change, so estimating
+        touches no values.
+        """
+        key, _ = value_filter(term, mode)
+        grams = _trigrams(key) or {""}
+        return sum(min(self._gram_count(field, gram) for gram in grams)
+                   for field in fields if field in self.postings)
+
+    def count_exact(self, field: str, value: str) -> int:
+        return len(self.postings.get(field, {}).get(fold(value), ()))
+
+    def matches_record(self, record: dict, term: str, fields: Iterable[str], mode: str = "substring") -> bool:
+        """Whether one record would be in `search(term, fields, mode)`"""
+        if mode != "substring":
+            return any(text_matches(value, term, mode) for field in fields for value in self._field_values(record, field))
+        term = fold(term)
+        return any(term in value for field in fields for value in self._field_values(record, field))
+
+    def empty(self):
+        return self.bitmap_cls()
+
+    def lookup(self, field: str, term: str):
+        """Records whose `field` contains `term` (case-insensitive substring)"""
+        term = fold(term)
+        return self.bitmap_cls.from_ids(chain.from_iterable(self._matching_postings(field, term)))
+
+    def lookup_exact(self, field: str, value: str):
+        """Records whose `field` equals `value` (case-insensitive)"""
+        return self.bitmap_cls.from_ids(self.postings[field].get(fold(value), ()))
+
+    def search(self, term: str, fields: Iterable[str], mode: str = "substring"):
+        """
+        Records where any of `fields` contains `term`, or matches it under
+        another match mode (see `src.query.fulltext.text_matches`)
+        """
+        if mode == "substring":
+            key, accept = fold(term), None
+        else:
+            key, accept = value_filter(term, mode)
+        postings = []
+        for field in fields:
+            postings.extend(self._matching_postings(field, key, accept))
+        return self.bitmap_cls.from_ids(chain.from_iterable(postings))
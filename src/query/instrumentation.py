@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Stages reported by the query pipeline, in pipeline order
+STAGES = ["intent", "entities", "dates", "terms", "boolean", "date_filter", "shards", "rank", "fetch", "display"]
+
+StageHook = Callable[[str, float, Dict], None]
+
+
+class Instrumentation:
+    def __init__(self):
+        """
+        Stage timing for the query pipeline.
+
+        Every stage run is timed, added to running per-stage metrics, logged
+        at DEBUG level with its duration and counts as structured `extra`
+        fields, and passed to any registered hooks as
+        `hook(stage, seconds, info)`. `info` carries stage details such as
+        candidate counts (`rows_in`, `rows_out`) or the number of entities.
+        """
+        self._hooks: List[StageHook] = []
+        self._totals: Dict[str, Dict[str, float]] = {}
+        # Engines may be shared by server worker threads
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: StageHook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: StageHook) -> None:
+        self._hooks.remove(hook)
+
+    @contextmanager
+    def stage(self, name: str, **info):
+        """
+        Time the enclosed block as stage `name`.
+
+        Yields the `info` dict so the block can add counts before it is reported.
+        """
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self.record(name, time.perf_counter() - start, info)
+
+    def record(self, name: str, seconds: float, info: Dict = None) -> None:
+        info = info or {}
+        with self._lock:
+            totals = self._totals.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            details = " ".join(f"{key}={value}" for key, value in info.items())
+            logger.debug("stage %s took %.2f ms %s", name, seconds * 1000, details,
+                         extra={"stage": name, "seconds": seconds, "info": info})
+        for hook in list(self._hooks):
+            hook(name, seconds, info)
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """Calls, total, mean and max seconds per stage since the last reset"""
+        with self._lock:
+            return {
+                name: {**totals, "mean_seconds": totals["seconds"] / totals["calls"]}
+                for name, totals in self._totals.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+class StageTrace:
+    """Hook that keeps every stage run it is called with, as plan tree nodes"""
+
+    def __init__(self):
+        self.nodes: List[Dict] = []
+
+    def __call__(self, name: str, seconds: float, info: Dict) -> None:
+        self.nodes.append({"stage": name, **info, "seconds": seconds})
+
+
+def stage(instrumentation, name: str, **info):
+    """`instrumentation.stage(name, **info)`, or an untimed block when instrumentation is None"""
+    if instrumentation is None:
+        return nullcontext(info)
+    return instrumentation.stage(name, **info)
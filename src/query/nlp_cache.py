@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+# Entries written between size checks; the table may exceed `max_entries` by this much
+EVICTION_INTERVAL = 64
+
+# Cache hits whose last-used times are written back together, so reads stay
+# read-only transactions and do not contend for the write lock
+TOUCH_BATCH = 64
+
+
+def normalize_text(text: str) -> str:
+    """Query text with whitespace collapsed (case is kept, since spaCy NER is case sensitive)"""
+    return " ".join(text.split())
+
+
+class NLPCache:
+    def __init__(self, path: str, max_entries: int = 100_000, timeout: float = 5.0):
+        """
+        On-disk cache of NLP results shared by processes and restarts.
+
+        Entries live in a SQLite database in WAL mode, so CLI runs and
+        server workers can read and write it concurrently. Each entry is a
+        JSON value under a namespace ("entities", "dates") and a key that
+        must include everything the result depends on (normalized text,
+        model and package versions, reference day). Once more than
+        `max_entries` are stored, the least recently used are evicted; hits
+        update the last-used times in batches of `TOUCH_BATCH`.
+
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: Maximum number of entries kept
+            timeout: Seconds to wait for another process's write lock
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        # (namespace, key) -> last hit, not yet written to the database
+        self._touched: Dict[Tuple[str, str], float] = {}
+        # One connection shared by the engine's threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, used REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+
+    @staticmethod
+    def _key(key) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, namespace: str, key) -> Optional[Any]:
+        """Cached value for a JSON-serializable key, or None"""
+        key = self._key(key)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE namespace = ? AND key = ?",
+                                     (namespace, key)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[namespace, key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+        return json.loads(row[0])
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("UPDATE entries SET used = ? WHERE namespace = ? AND key = ?",
+                                   [(used, namespace, key) for (namespace, key), used in self._touched.items()])
+        self._touched.clear()
+
+    def put(self, namespace: str, key, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries (namespace, key, value, used) VALUES (?, ?, ?, ?)",
+                               (namespace, self._key(key), json.dumps(value), time.time()))
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._flush_touched()
+                self._evict()
+
+    def _evict(self) -> None:
+        excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute("DELETE FROM entries WHERE rowid IN "
+                               "(SELECT rowid FROM entries ORDER BY used LIMIT ?)", (excess,))
+            self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
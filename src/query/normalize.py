@@ -0,0 +1,31 @@
+import sys
+from typing import Dict, Iterable, Union
+
+# Short, highly repeated values (people, teams, topics, places); interned so
+# every record shares one string object per distinct value
+INTERNED_FIELDS = {"sender", "recipients", "cc", "attendees", "team", "topic", "location", "meeting_type"}
+
+NormalizedValue = Union[str, frozenset]
+
+
+def fold(text: str) -> str:
+    """Case-insensitive form of a value or search term"""
+    return text.casefold()
+
+
+def normalize_value(field: str, value) -> NormalizedValue:
+    if isinstance(value, list):
+        return frozenset(sys.intern(fold(v)) for v in value)
+    text = fold(value or "")
+    return sys.intern(text) if field in INTERNED_FIELDS else text
+
+
+def normalize_record(record: dict, fields: Iterable[str]) -> Dict[str, NormalizedValue]:
+    """
+    Casefolded copy of a record's search fields, built once at load time.
+
+    String fields become casefolded strings and list fields (recipients, cc,
+    attendees) frozensets of casefolded names, so matching never has to
+    lowercase record data per query.
+    """
+    return {field: normalize_value(field, record.get(field)) for field in fields}
@@ -0,0 +1,245 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+# Once this few candidates survive, remaining predicates are checked record
+# by record instead of being resolved against the whole source
+VERIFY_LIMIT = 256
+
+
+class Predicate:
+    """One conjunct of a query plan"""
+
+    label = ""
+    # Instrumentation stage its evaluation is reported under
+    stage = "terms"
+
+    def estimate(self) -> int:
+        """Upper bound on the number of matching records"""
+        raise NotImplementedError
+
+    def resolve(self):
+        """Matching record ids as a result set"""
+        raise NotImplementedError
+
+    def check(self, row: int) -> bool:
+        """Whether a single record matches"""
+        raise NotImplementedError
+
+    def explain(self) -> Dict:
+        """Plan tree node for this predicate"""
+        return {"stage": self.stage, "predicate": self.label}
+
+
+class TermPredicate(Predicate):
+    def __init__(self, source, term: str, match_fn: Callable[[str], object], mode: str = "substring"):
+        """
+        A `from:`/`to:`/`cc:` or free-text term.
+
+        Args:
+            source: DataSource the term is matched against
+            term: Match term as understood by `DataSource.match`
+            match_fn: Memoized term resolver
+            mode: Match mode of free-text terms
+        """
+        self.source = source
+        self.term = term
+        self.match_fn = match_fn
+        self.mode = mode
+        self.label = term
+
+    def estimate(self) -> int:
+        return self.source.estimate(self.term, self.mode)
+
+    def resolve(self):
+        return self.match_fn(self.term)
+
+    def check(self, row: int) -> bool:
+        return self.source.record_matches(row, self.term, self.mode)
+
+
+class TeamPredicate(Predicate):
+    def __init__(self, source, team: str):
+        self.source = source
+        self.team = team
+        self.label = f"team={team}"
+
+    def estimate(self) -> int:
+        return self.source.team_count(self.team)
+
+    def resolve(self):
+        return self.source.team_matches(self.team)
+
+    def check(self, row: int) -> bool:
+        return self.source.record_in_team(row, self.team)
+
+
+class DatePredicate(Predicate):
+    stage = "date_filter"
+
+    def __init__(self, source, start: Optional[str], end: Optional[str]):
+        """Records dated within [start, end] (ISO days, either bound may be None)"""
+        self.source = source
+        self.start = start
+        self.end = end
+        self.label = f"date {start or '*'}..{end or '*'}"
+
+    def estimate(self) -> int:
+        return self.source.timeline.count_between(self.start, self.end)
+
+    def resolve(self):
+        return self.source.date_matches(self.start, self.end)
+
+    def check(self, row: int) -> bool:
+        day = self.source.timeline.day_of(self.source.records[row])
+        if day is None:
+            return False
+        return (self.start is None or day >= self.start) and (self.end is None or day <= self.end)
+
+
+class AnyOf(Predicate):
+    def __init__(self, label: str, predicates: List[Predicate], empty):
+        """
+        Union of predicates (e.g. any of the query's topics).
+
+        Args:
+            label: Name shown in plans
+            predicates: Alternatives
+            empty: Empty result set of the source's bitmap type
+        """
+        self.label = label
+        self.predicates = predicates
+        self.empty = empty
+
+    def estimate(self) -> int:
+        return sum(predicate.estimate() for predicate in self.predicates)
+
+    def resolve(self):
+        matches = self.empty
+        for predicate in self.predicates:
+            matches = matches | predicate.resolve()
+        return matches
+
+    def check(self, row: int) -> bool:
+        return any(predicate.check(row) for predicate in self.predicates)
+
+    def explain(self) -> Dict:
+        children = [{**predicate.explain(), "estimate": predicate.estimate()} for predicate in self.predicates]
+        return {**super().explain(), "children": children}
+
+
+class BooleanPredicate(Predicate):
+    stage = "boolean"
+
+    def __init__(self, source, postfix: List[str], evaluate: Callable, match_fn: Callable[[str], object],
+                 mode: str = "substring"):
+        """
+        A parsed AND/OR/NOT expression.
+
+        Args:
+            source: DataSource the terms are matched against
+            postfix: Expression in postfix form (see `BooleanParser.parse`)
+            evaluate: `BooleanParser.evaluate`
+            match_fn: Memoized term resolver
+            mode: Match mode of the terms
+        """
+        self.source = source
+        self.postfix = postfix
+        self.evaluate = evaluate
+        self.match_fn = match_fn
+        self.mode = mode
+        self.label = " ".join(postfix)
+
+    def estimate(self) -> int:
+        # No cheap bound for NOT; run it last
+        return self.source.index.size
+
+    def resolve(self):
+        return self.evaluate(self.postfix, self.match_fn, universe=self.source.universe)
+
+    def check(self, row: int) -> bool:
+        single = {row}
+        match = lambda term: single if self.source.record_matches(row, term, self.mode) else set()
+        return bool(self.evaluate(self.postfix, match, universe=single))
+
+
+class QueryPlan:
+    def __init__(self, predicates: List[Predicate], universe, bitmap_cls, instrumentation=None,
+                 branch: str = "", fallback: bool = False):
+        """
+        Intersection of predicates, cheapest first.
+
+        Predicates are ordered by their estimated cardinality, so the running
+        intersection shrinks as early as possible. Evaluation stops as soon as
+        it is empty, and once at most `VERIFY_LIMIT` candidates remain the
+        rest of the predicates are checked on those records directly rather
+        than resolved over the whole source.
+
+        Args:
+            predicates: Conjuncts of the query
+            universe: Every record of the source (the result with no predicates)
+            bitmap_cls: Result set type, for verified candidates
+            instrumentation: Optional `Instrumentation` each step is reported to
+            branch: Which kind of query the predicates came from (see `plan_query`)
+            fallback: Whether the search terms are plain query words because
+                no entities were found
+        """
+        self.universe = universe
+        self.bitmap_cls = bitmap_cls
+        self.instrumentation = instrumentation
+        self.branch = branch
+        self.fallback = fallback
+        estimated = [(predicate.estimate(), n, predicate) for n, predicate in enumerate(predicates)]
+        estimated.sort(key=lambda item: item[:2])
+        self.predicates = [predicate for _, _, predicate in estimated]
+        self.estimates = [estimate for estimate, _, _ in estimated]
+        # One entry per predicate once run: label, stage, estimate, rows
+        # in/out, method and seconds
+        self.steps: List[Dict] = []
+
+    def run(self):
+        result = self.universe
+        for n, (predicate, estimate) in enumerate(zip(self.predicates, self.estimates)):
+            rows_in = len(result)
+            if not rows_in:
+                self.steps.append(self._step(predicate, estimate, 0, 0, "skipped", 0.0))
+                continue
+            start = time.perf_counter()
+            if n and rows_in <= VERIFY_LIMIT and rows_in < estimate:
+                result = self.bitmap_cls.from_ids([row for row in result if predicate.check(row)])
+                method = "verify"
+            else:
+                matches = predicate.resolve()
+                result = matches if n == 0 else result & matches
+                method = "index"
+            step = self._step(predicate, estimate, rows_in, len(result), method, time.perf_counter() - start)
+            self.steps.append(step)
+            if self.instrumentation is not None:
+                self.instrumentation.record(predicate.stage, step["seconds"], {
+                    "predicate": predicate.label, "method": method, "rows_in": rows_in, "rows_out": step["rows_out"]})
+        return result
+
+    def explain(self) -> Dict:
+        """
+        The plan as a tree node: the branch taken, with one child per
+        predicate in evaluation order carrying its estimate, rows in and out,
+        method and time once the plan has run.
+        """
+        children = [{**predicate.explain(), **step} for predicate, step in zip(self.predicates, self.steps)]
+        children += [{**predicate.explain(), "estimate": estimate}
+                     for predicate, estimate in zip(self.predicates[len(self.steps):], self.estimates[len(self.steps):])]
+        rows_in = len(self.universe)
+        return {
+            "stage": "filter",
+            "branch": self.branch,
+            "fallback": self.fallback,
+            "rows_in": rows_in,
+            "rows_out": self.steps[-1]["rows_out"] if self.steps else rows_in,
+            "seconds": sum(step["seconds"] for step in self.steps),
+            "children": children,
+        }
+
+    @staticmethod
+    def _step(predicate: Predicate, estimate: int, rows_in: int, rows_out: int, method: str,
+              seconds: float) -> Dict:
+        return {"predicate": predicate.label, "stage": predicate.stage, "estimate": estimate,
+                "rows_in": rows_in, "rows_out": rows_out, "method": method, "seconds": seconds}
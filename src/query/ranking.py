@@ -0,0 +1,208 @@
+import heapq
+import math
+import re
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Field boosts for relevance scoring, per source
+EMAIL_RANK_FIELDS = {"subject": 2.0, "topic": 3.0, "body": 1.0}
+CALENDAR_RANK_FIELDS = {"title": 2.0, "topic": 3.0, "description": 1.0}
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def merge_statistics(parts: Iterable[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Sum `BM25Scorer.statistics` of disjoint parts of a corpus (e.g. shards) into those of the whole"""
+    merged: Dict[str, Dict] = {}
+    for part in parts:
+        for field, stats in part.items():
+            total = merged.setdefault(field, {"size": 0, "total_length": 0, "df": {}})
+            total["size"] += stats["size"]
+            total["total_length"] += stats["total_length"]
+            df = total["df"]
+            for token, count in stats["df"].items():
+                df[token] = df.get(token, 0) + count
+    return merged
+
+
+def query_statistics(statistics: Dict[str, Dict], tokens: Iterable[str]) -> Dict[str, Dict]:
+    """`statistics` with document frequencies cut down to the query `tokens`"""
+    tokens = set(tokens)
+    return {field: {**stats, "df": {token: stats["df"][token] for token in tokens if token in stats["df"]}}
+            for field, stats in statistics.items()}
+
+
+class BM25Scorer:
+    def __init__(self, records: List[dict], field_boosts: Dict[str, float], k1: float = 1.2, b: float = 0.75):
+        """
+        BM25 relevance scores over a few text fields, combined with field boosts.
+
+        Keeps per-field term frequencies so a query scores only the documents
+        it matched, and `top_k` selects a page with a bounded heap instead of
+        sorting every match.
+
+        Args:
+            records: Records to score; ids are positions in this list
+            field_boosts: Field name -> weight of that field's BM25 score
+            k1: Term frequency saturation
+            b: Length normalization strength
+        """
+        self.field_boosts = dict(field_boosts)
+        self.k1 = k1
+        self.b = b
+        # field -> token -> {record id: term frequency}
+        self.postings: Dict[str, Dict[str, Dict[int, int]]] = {field: {} for field in self.field_boosts}
+        # field -> record id -> token count
+        self.lengths: Dict[str, Dict[int, int]] = {field: {} for field in self.field_boosts}
+        self.total_lengths: Dict[str, int] = {field: 0 for field in self.field_boosts}
+
+        for record_id, record in enumerate(records):
+            self.add(record_id, record)
+
+    def add(self, record_id: int, record: dict) -> None:
+        for field in self.field_boosts:
+            tokens = tokenize(record.get(field) or "")
+            postings = self.postings[field]
+            for token in tokens:
+                freqs = postings.setdefault(token, {})
+                freqs[record_id] = freqs.get(record_id, 0) + 1
+            self.lengths[field][record_id] = len(tokens)
+            self.total_lengths[field] += len(tokens)
+
+    def remove(self, record_id: int, record: dict) -> None:
+        for field in self.field_boosts:
+            postings = self.postings[field]
+            for token in set(tokenize(record.get(field) or "")):
+                freqs = postings.get(token)
+                if freqs is not None:
+                    freqs.pop(record_id, None)
+                    if not freqs:
+                        del postings[token]
+            self.total_lengths[field] -= self.lengths[field].pop(record_id, 0)
+
+    def statistics(self) -> Dict[str, Dict]:
+        """Per field: record count, total token count and document frequency of each token"""
+        return {field: {"size": len(self.lengths[field]), "total_length": self.total_lengths[field],
+                        "df": {token: len(freqs) for token, freqs in self.postings[field].items()}}
+                for field in self.field_boosts}
+
+    def scores(self, ids: Iterable[int], tokens: Iterable[str],
+               statistics: Optional[Dict[str, Dict]] = None) -> Dict[int, float]:
+        """
+        BM25 score of each record in `ids` for the query `tokens`.
+
+        Args:
+            statistics: Corpus statistics to score with instead of this
+                scorer's own (see `statistics`), e.g. those of every shard
+                merged, so scores match those over the whole corpus
+        """
+        ids = ids if isinstance(ids, (set, frozenset)) else set(ids)
+        scores = dict.fromkeys(ids, 0.0)
+        for field, boost in self.field_boosts.items():
+            lengths = self.lengths[field]
+            if statistics is None:
+                size, total_length, df = len(lengths), self.total_lengths[field], None
+            else:
+                size, total_length, df = (statistics[field]["size"], statistics[field]["total_length"],
+                                          statistics[field]["df"])
+            if not size:
+                continue
+            avg_length = (total_length / size) or 1.0
+            for token in set(tokens):
+                freqs = self.postings[field].get(token)
+                if not freqs:
+                    continue
+                doc_freq = len(freqs) if df is None else df.get(token, len(freqs))
+                idf = math.log(1 + (size - doc_freq + 0.5) / (doc_freq + 0.5))
+                # Walk whichever side is smaller: the matches or the posting list
+                if len(ids) < len(freqs):
+                    pairs = ((i, freqs[i]) for i in ids if i in freqs)
+                else:
+                    pairs = ((i, tf) for i, tf in freqs.items() if i in ids)
+                for i, tf in pairs:
+                    norm = tf + self.k1 * (1 - self.b + self.b * lengths[i] / avg_length)
+                    scores[i] += boost * idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def top_k(self, ids: Iterable[int], tokens: Iterable[str], limit: Optional[int] = None,
+              offset: int = 0, statistics: Optional[Dict[str, Dict]] = None) -> List[Tuple[float, int]]:
+        """
+        Highest scoring (score, id) pairs, best first; ties keep id order.
+
+        Args:
+            ids: Matching record ids
+            tokens: Query tokens
+            limit: Page size (None for every match)
+            offset: Number of top results to skip
+            statistics: Corpus statistics to score with, see `scores`
+        """
+        scores = self.scores(ids, tokens, statistics)
+        key = lambda i: (-scores[i], i)
+        if limit is None:
+            ranked = sorted(scores, key=key)
+        else:
+            ranked = heapq.nsmallest(offset + limit, scores, key=key)
+        return [(scores[i], i) for i in ranked[offset:]]
+
+    def ranked_ids(self, ids: Iterable[int], tokens: Iterable[str], limit: Optional[int] = None,
+                   offset: int = 0) -> Iterator[int]:
+        """
+        Ids in `top_k` order, produced lazily when nothing needs scoring.
+
+        If no query token occurs in the scored fields every score is zero, so
+        the page is read straight off `ids` in ascending order without scoring.
+        """
+        tokens = [token for token in set(tokens)
+                  if any(token in self.postings[field] for field in self.field_boosts)]
+        if not tokens:
+            return islice(ids, offset, None if limit is None else offset + limit)
+        return (i for _, i in self.top_k(ids, tokens, limit=limit, offset=offset))
+
+
+class ResultPage(list):
+    def __init__(self, rows: Iterable[dict] = (), total: int = 0):
+        """
+        One page of ranked results.
+
+        Args:
+            rows: Records on this page, best first
+            total: Number of records the query matched across all pages
+        """
+        super().__init__(rows)
+        self.total = total
+        # How the query ran, when it was run with `explain=True`
+        self.plan: Optional[Dict] = None
+
+
+class ResultCursor:
+    def __init__(self, rows: Iterable[dict], total: int = 0):
+        """
+        Query results produced as they are read.
+
+        Args:
+            rows: Records, best first; typically a generator that builds each
+                record on demand
+            total: Number of records the query matched across all pages
+        """
+        self._rows = iter(rows)
+        self.total = total
+        self.fetched = 0
+
+    def __iter__(self) -> "ResultCursor":
+        return self
+
+    def __next__(self) -> dict:
+        row = next(self._rows)
+        self.fetched += 1
+        return row
+
+    def fetchmany(self, size: int) -> List[dict]:
+        """Up to `size` more records"""
+        return list(islice(self, size))
+
+    def close(self) -> None:
+        self._rows = iter(())
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.nlp.entity_extractor import EXTRACTION_TIERS
+from src.query.engine import QueryEngine
+from src.query.fulltext import MATCH_MODES
+from src.query.sharding import ShardedQueryEngine
+from src.query.watcher import DataWatcher
+
+MAX_BODY_BYTES = 64 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+# Engine owned by a process-pool worker, see `_init_worker`
+_worker_engine: Optional[QueryEngine] = None
+
+
+def _init_worker(engine_kwargs: Dict) -> None:
+    global _worker_engine
+    _worker_engine = QueryEngine(**engine_kwargs)
+    _worker_engine.warmup()
+
+
+def run_query(engine: Optional[QueryEngine], user_query: str, limit: Optional[int] = None,
+              offset: int = 0, match_mode: str = "substring", explain: bool = False) -> Dict:
+    """
+    Run one query and return a JSON-serializable result.
+
+    `engine` is None inside process-pool workers, which use their own engine.
+    `count` is the total number of matches; `results` holds the requested page.
+    With `explain`, `plan` holds the executed plan tree.
+    """
+    engine = engine or _worker_engine
+    results = engine.process_query(user_query, limit=limit, offset=offset, match_mode=match_mode,
+                                   explain=explain)
+    response = {
+        "query": user_query,
+        "intent": engine.classify_intent(user_query),
+        "count": results.total,
+        "offset": offset,
+        "results": list(results),
+    }
+    if explain:
+        response["plan"] = results.plan
+    return response
+
+
+class QueryServer:
+    def __init__(self, engine: QueryEngine, host: str = "127.0.0.1", port: int = 8765,
+                 workers: int = 4, executor: str = "thread", max_pending: int = 32,
+                 timeout: float = 10.0):
+        """
+        Long-running JSON-over-HTTP front end for a warm QueryEngine.
+
+        Query work (spaCy, dateparser, matching) runs on a bounded thread or
+        process pool. Requests beyond `max_pending` in flight are rejected
+        with 503 instead of queueing without bound, and requests that take
+        longer than `timeout` get 504. A timed-out query keeps its slot
+        until the pool actually finishes it.
+
+        Args:
+            engine: Engine to serve; in process mode its paths and options are
+                used to build one engine per worker
+            host: Interface to bind (localhost by default)
+            port: TCP port
+            workers: Pool size
+            executor: "thread" or "process"
+            max_pending: Maximum requests in flight before rejecting
+            timeout: Per-request timeout in seconds
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process'")
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.executor_kind = executor
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _make_executor(self) -> Executor:
+        if self.executor_kind == "process":
+            engine_kwargs = {
+                "emails_path": self.engine.emails_path,
+                "calendar_path": self.engine.calendar_path,
+                "metadata_path": self.engine.metadata_path,
+                "columnar": self.engine.columnar,
+                "extraction_tier": self.engine.extraction_tier,
+                "metadata_artifact": self.engine.metadata_artifact,
+                "nlp_cache_path": self.engine.nlp_cache_path,
+            }
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(engine_kwargs,))
+        self.engine.warmup()
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    async def start(self) -> None:
+        self._executor = self._make_executor()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"[INFO] Serving on http://{self.host}:{self.port} "
+              f"({self.workers} {self.executor_kind} workers)")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        method, path, _ = request_line.split(" ", 2)
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, body
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+            except OverflowError:
+                await self._respond(writer, 413, {"error": "request body too large"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await self._respond(writer, 400, {"error": "malformed request"})
+                return
+
+            if path == "/health":
+                health = {"status": "ok", "pending": self.pending, "executor": self.executor_kind}
+                if self.executor_kind == "thread":
+                    health["cache"] = self.engine.cache.stats()
+                    health["stages"] = self.engine.instrumentation.metrics()
+                    health["extraction"] = self.engine.entity_extractor.tier_stats()
+                    health["dates"] = self.engine.date_parser.path_stats()
+                    if self.engine.nlp_cache is not None:
+                        health["nlp_cache"] = self.engine.nlp_cache.stats()
+                await self._respond(writer, 200, health)
+            elif path == "/query":
+                if method != "POST":
+                    await self._respond(writer, 405, {"error": "use POST"})
+                    return
+                status, payload = await self._query(body)
+                await self._respond(writer, status, payload)
+            else:
+                await self._respond(writer, 404, {"error": f"unknown path {path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _query(self, body: bytes) -> Tuple[int, Dict]:
+        try:
+            request = json.loads(body or b"{}")
+            user_query = request["query"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'expected a JSON body like {"query": "..."}'}
+        if not isinstance(user_query, str):
+            return 400, {"error": "query must be a string"}
+        limit = request.get("limit")
+        offset = request.get("offset", 0)
+        # bool is a subclass of int, but true/false are not page sizes
+        if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+            return 400, {"error": "limit must be a non-negative integer"}
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            return 400, {"error": "offset must be a non-negative integer"}
+        match_mode = request.get("match_mode", "substring")
+        if match_mode not in MATCH_MODES:
+            return 400, {"error": f"match_mode must be one of {MATCH_MODES}"}
+        explain = request.get("explain", False)
+        if not isinstance(explain, bool):
+            return 400, {"error": "explain must be true or false"}
+
+        # Backpressure: reject rather than queue once the pool is saturated
+        if self.pending >= self.max_pending:
+            return 503, {"error": "server busy, retry later"}
+
+        engine = self.engine if self.executor_kind == "thread" else None
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._executor, run_query, engine, user_query, limit, offset,
+                                          match_mode, explain)
+        except RuntimeError as e:
+            return 500, {"error": str(e)}
+        # The slot is held until the pool finishes the query, even after a 504,
+        # so work still running counts against `max_pending`
+        self.pending += 1
+        future.add_done_callback(self._release)
+        try:
+            return 200, await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": f"query timed out after {self.timeout}s"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    def _release(self, future: asyncio.Future) -> None:
+        self.pending -= 1
+        # Mark errors of timed-out queries as seen
+        if not future.cancelled():
+            future.exception()
+
+
+def main(argv: List[str] = None) -> None:
+    arg_parser = argparse.ArgumentParser(description="Serve natural language queries over HTTP")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    arg_parser.add_argument("--max-pending", type=int, default=32)
+    arg_parser.add_argument("--timeout", type=float, default=10.0)
+    arg_parser.add_argument("--emails", default="Data/emails.json")
+    arg_parser.add_argument("--calendar", default="Data/calendar_events.json")
+    arg_parser.add_argument("--metadata", default="Data/metadata.json")
+    arg_parser.add_argument("--shards", type=int, default=0, help="Spread matching over N shard processes")
+    arg_parser.add_argument("--watch", action="store_true", help="Pick up changes to the data files while running")
+    arg_parser.add_argument("--columnar", action="store_true")
+    arg_parser.add_argument("--extraction-tier", choices=EXTRACTION_TIERS, default="auto",
+                            help="Run spaCy NER never, always, or only for unknown capitalized words")
+    arg_parser.add_argument("--nlp-cache", metavar="PATH",
+                            help="SQLite file caching entity and date results across runs and processes")
+    arg_parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="[%(levelname)s] %(name)s: %(message)s")
+    if args.shards and args.executor == "process":
+        arg_parser.error("--shards runs its own process pool; use it with --executor thread")
+    if args.watch and args.executor == "process":
+        # The watcher only updates this process's engine, not the workers' own engines
+        arg_parser.error("--watch does not reach process workers; use it with --executor thread")
+
+    if args.shards:
+        engine = ShardedQueryEngine(args.emails, args.calendar, args.metadata, columnar=args.columnar,
+                                    extraction_tier=args.extraction_tier, nlp_cache_path=args.nlp_cache,
+                                    shards=args.shards)
+    else:
+        engine = QueryEngine(args.emails, args.calendar, args.metadata, columnar=args.columnar,
+                             extraction_tier=args.extraction_tier, nlp_cache_path=args.nlp_cache)
+    if args.watch:
+        DataWatcher(engine).start()
+    server = QueryServer(engine, host=args.host, port=args.port, workers=args.workers,
+                         executor=args.executor, max_pending=args.max_pending, timeout=args.timeout)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import heapq
+import os
+import time
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.query.engine import DataSource, QueryEngine, explain_rows, ranked_rows, source_kind
+from src.query.ranking import ResultCursor, ResultPage, merge_statistics, query_statistics
+
+# Data sources held by a shard worker process, see `_init_shard`
+_shard_sources: Dict[str, DataSource] = {}
+
+
+def _init_shard(shard_records: Dict[str, List[dict]], columnar: bool, bitmap_cls) -> None:
+    for kind, records in shard_records.items():
+        _shard_sources[kind] = DataSource(kind, records, columnar=columnar, bitmap_cls=bitmap_cls)
+
+
+def _shard_sizes() -> Dict[str, int]:
+    return {kind: len(source.records) for kind, source in _shard_sources.items()}
+
+
+def _shard_statistics() -> Dict[str, Dict]:
+    return {kind: source.scorer.statistics() for kind, source in _shard_sources.items()}
+
+
+def _shard_execute(analyses: List[Dict], limit: Optional[int],
+                   statistics: List[Dict]) -> List[Tuple[int, List[Tuple[float, dict]]]]:
+    """
+    Match and rank a list of analyzed queries against this worker's shard,
+    keeping the top `limit`. Each query is ranked with the corpus-wide BM25
+    statistics given for it, so scores are comparable across shards.
+    """
+    memos: Dict[str, Dict] = {}
+    results = []
+    for analysis, query_stats in zip(analyses, statistics):
+        kind = source_kind(analysis["intent"])
+        source = _shard_sources[kind]
+        results.append(ranked_rows(source, analysis, memo=memos.setdefault(kind, {}), limit=limit,
+                                   statistics=query_stats))
+    return results
+
+
+def _shard_explain(analysis: Dict, limit: Optional[int],
+                   statistics: Dict) -> Tuple[int, List[Tuple[float, dict]], List[Dict]]:
+    return explain_rows(_shard_sources[source_kind(analysis["intent"])], analysis, limit=limit,
+                        statistics=statistics)
+
+
+def _shard_known_ids(kind: str, ids: List[str]) -> List[str]:
+    id_rows = _shard_sources[kind].id_rows
+    return [record_id for record_id in ids if record_id in id_rows]
+
+
+def _shard_upsert(kind: str, records: List[dict], append_new: bool) -> Dict[str, int]:
+    return _shard_sources[kind].upsert(records, append_new=append_new)
+
+
+def split_shards(records: List[dict], count: int) -> List[List[dict]]:
+    """
+    Split records into `count` contiguous slices of near-equal size.
+
+    Slices are contiguous so concatenating per-shard results in shard order
+    keeps the original record order.
+    """
+    size, extra = divmod(len(records), count)
+    shards, start = [], 0
+    for n in range(count):
+        end = start + size + (1 if n < extra else 0)
+        shards.append(records[start:end])
+        start = end
+    return shards
+
+
+def merge_pages(partials: List[Tuple[int, List[Tuple[float, dict]]]], offset: int,
+                end: Optional[int]) -> ResultPage:
+    """Merge per-shard (total, [(score, record)]) results into one page"""
+    total = sum(shard_total for shard_total, _ in partials)
+    # heapq.merge is stable, so equal scores stay in shard (record) order
+    ranked = heapq.merge(*(shard_ranked for _, shard_ranked in partials), key=lambda pair: -pair[0])
+    return ResultPage((record for _, record in islice(ranked, offset, end)), total=total)
+
+
+class ShardedQueryEngine(QueryEngine):
+    def __init__(self, *args, shards: int = None, **kwargs):
+        """
+        QueryEngine that spreads matching across a pool of shard processes.
+
+        Emails and calendar events are split into `shards` contiguous slices,
+        each held by its own worker process with its own indexes. NLP analysis
+        runs once in the parent; the matching and date filtering for each
+        query fan out to every shard. Each shard ranks its own matches with
+        BM25 statistics of the whole corpus, which the parent sums from the
+        shards once per data version, and returns its best `offset + limit`;
+        the parent merges those by score, ties in shard order, so pages are
+        the same as without sharding. As in QueryEngine, queries and
+        ingestion hold the data lock for their whole fan-out, so a query never
+        sees an update applied to only some of the shards.
+
+        Args:
+            *args, **kwargs: Passed to QueryEngine
+            shards: Number of shard processes (defaults to the CPU count)
+        """
+        super().__init__(*args, **kwargs)
+        self.shard_count = shards or os.cpu_count() or 1
+        self._shards: List[ProcessPoolExecutor] = []
+        # Source kind -> BM25 statistics of the whole corpus, for `_statistics_version`
+        self._statistics: Dict[str, Dict] = {}
+        self._statistics_version: Optional[int] = None
+
+    def _start_shards(self) -> None:
+        # Called with the data lock held, so concurrent first queries start one set of shards
+        if self._shards:
+            return
+        slices = {kind: split_shards(self._read_records(kind), self.shard_count)
+                  for kind in ("email", "calendar")}
+        for n in range(self.shard_count):
+            shard_records = {kind: slices[kind][n] for kind in slices}
+            self._shards.append(ProcessPoolExecutor(
+                max_workers=1, initializer=_init_shard, initargs=(shard_records, self.columnar, self.bitmap_cls)))
+
+    def _load_all_sources(self) -> None:
+        self.shard_sizes()
+
+    def shard_sizes(self) -> List[Dict[str, int]]:
+        """Records held by each shard (starts the shards if needed)"""
+        with self._data_lock:
+            self._start_shards()
+            return [future.result() for future in [shard.submit(_shard_sizes) for shard in self._shards]]
+
+    def corpus_statistics(self, kind: str) -> Dict[str, Dict]:
+        """BM25 statistics of every `kind` record, summed over the shards once per data version"""
+        with self._data_lock:
+            self._start_shards()
+            if self._statistics_version != self.data_version:
+                parts = [future.result() for future in [shard.submit(_shard_statistics) for shard in self._shards]]
+                self._statistics = {name: merge_statistics(part[name] for part in parts) for name in parts[0]}
+                self._statistics_version = self.data_version
+            return self._statistics[kind]
+
+    def _query_statistics(self, analysis: Dict) -> Dict[str, Dict]:
+        return query_statistics(self.corpus_statistics(source_kind(analysis["intent"])), analysis["rank_tokens"])
+
+    def execute(self, analysis: Dict, memo: Dict = None, limit: Optional[int] = None,
+                offset: int = 0) -> ResultPage:
+        return self.execute_many([analysis], limit=limit, offset=offset)[0]
+
+    def execute_iter(self, analysis: Dict, limit: Optional[int] = None, offset: int = 0) -> ResultCursor:
+        # Shard results come back as whole pages, so this cursor reads a materialized page
+        page = self.execute(analysis, limit=limit, offset=offset)
+        return ResultCursor(page, total=page.total)
+
+    def execute_many(self, analyses: List[Dict], limit: Optional[int] = None,
+                     offset: int = 0) -> List[ResultPage]:
+        shard_limit = None if limit is None else offset + limit
+        with self._data_lock:
+            self._start_shards()
+            statistics = [self._query_statistics(analysis) for analysis in analyses]
+            with self.instrumentation.stage("shards", queries=len(analyses), shards=len(self._shards)):
+                futures = [shard.submit(_shard_execute, analyses, shard_limit, statistics)
+                           for shard in self._shards]
+                partials = [future.result() for future in futures]
+        return [merge_pages([partial[i] for partial in partials], offset, shard_limit)
+                for i in range(len(analyses))]
+
+    def execute_explain(self, analysis: Dict, limit: Optional[int] = None,
+                        offset: int = 0) -> Tuple[ResultPage, List[Dict]]:
+        """Like `execute`, with one plan subtree per shard under a "shards" node"""
+        shard_limit = None if limit is None else offset + limit
+        with self._data_lock:
+            self._start_shards()
+            statistics = self._query_statistics(analysis)
+            start = time.perf_counter()
+            futures = [shard.submit(_shard_explain, analysis, shard_limit, statistics) for shard in self._shards]
+            partials = [future.result() for future in futures]
+        node = {
+            "stage": "shards",
+            "seconds": time.perf_counter() - start,
+            "children": [{"stage": "shard", "shard": n, "rows_out": total, "children": nodes}
+                         for n, (total, _, nodes) in enumerate(partials)],
+        }
+        page = merge_pages([(total, ranked) for total, ranked, _ in partials], offset, shard_limit)
+        return page, [node]
+
+    def ingest(self, kind: str, records: List[dict]) -> Dict[str, int]:
+        """
+        Upsert records across the shards: each shard updates the ids it holds
+        and the last shard appends new ones, so merged results keep record order.
+        """
+        with self._data_lock:
+            self._start_shards()
+            ids = [record.get("id") for record in records]
+            known = set()
+            for future in [shard.submit(_shard_known_ids, kind, ids) for shard in self._shards]:
+                known.update(future.result())
+            updates = [record for record in records if record.get("id") in known]
+            new = [record for record in records if record.get("id") not in known]
+
+            futures = [shard.submit(_shard_upsert, kind, updates, False) for shard in self._shards]
+            futures.append(self._shards[-1].submit(_shard_upsert, kind, new, True))
+            counts = {"added": 0, "updated": 0, "unchanged": 0}
+            for future in futures:
+                for key, value in future.result().items():
+                    counts[key] += value
+            if counts["added"] or counts["updated"]:
+                self._learn_entities(records)
+                self._data_changed()
+        return counts
+
+    def reload(self) -> None:
+        self.close()
+        super().reload()
+
+    def close(self) -> None:
+        """Shut down the shard processes; they restart on the next query"""
+        with self._data_lock:
+            for shard in self._shards:
+                shard.shutdown(wait=True)
+            self._shards = []
+            self._statistics_version = None
@@ -0,0 +1,67 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+
+from src.query.bitmap import Bitmap
+
+
+class TimestampIndex:
+    def __init__(self, records: List[dict], bitmap_cls=Bitmap):
+        """
+        Secondary index of record ids sorted by the day of their timestamp.
+
+        Date ranges resolve to two binary searches plus a slice instead of a
+        scan over every record. Records without a usable timestamp are left
+        out, matching the `item["timestamp"][:10]` comparisons it replaces.
+
+        Args:
+            records: Records to index; ids are positions in this list
+            bitmap_cls: Result set type (see `src.query.bitmap`)
+        """
+        self.bitmap_cls = bitmap_cls
+        pairs = sorted(
+            (item["timestamp"][:10], i) for i, item in enumerate(records)
+            if item.get("timestamp") and len(item["timestamp"]) >= 10
+        )
+        self.days: List[str] = [day for day, _ in pairs]
+        self.ids: List[int] = [i for _, i in pairs]
+
+    @staticmethod
+    def day_of(record: dict) -> Optional[str]:
+        """ISO day a record is indexed under, or None if it has no usable timestamp"""
+        timestamp = record.get("timestamp")
+        if timestamp and len(timestamp) >= 10:
+            return timestamp[:10]
+        return None
+
+    def add(self, record_id: int, record: dict) -> None:
+        day = self.day_of(record)
+        if day is None:
+            return
+        pos = bisect_right(self.days, day)
+        self.days.insert(pos, day)
+        self.ids.insert(pos, record_id)
+
+    def remove(self, record_id: int, record: dict) -> None:
+        day = self.day_of(record)
+        if day is None:
+            return
+        lo, hi = self._bounds(day, day)
+        for pos in range(lo, hi):
+            if self.ids[pos] == record_id:
+                del self.days[pos]
+                del self.ids[pos]
+                return
+
+    def _bounds(self, start: Optional[str], end: Optional[str]):
+        lo = bisect_left(self.days, start) if start is not None else 0
+        hi = bisect_right(self.days, end) if end is not None else len(self.days)
+        return lo, max(lo, hi)
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None):
+        """Records dated within [start, end] (ISO days, either bound may be None)"""
+        lo, hi = self._bounds(start, end)
+        return self.bitmap_cls.from_ids(self.ids[lo:hi])
+
+    def count_between(self, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        lo, hi = self._bounds(start, end)
+        return hi - lo
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.query.engine import QueryEngine
+
+logger = logging.getLogger(__name__)
+
+
+class DataWatcher:
+    def __init__(self, engine: QueryEngine, interval: float = 2.0,
+                 append_logs: Optional[Dict[str, str]] = None):
+        """
+        Poll the engine's data files and feed changes into `engine.ingest`.
+
+        The JSON files are re-read when their modification time or size
+        changes; records are upserted by `id`, so unchanged records cost only a
+        comparison and removed records are kept. JSONL append logs are read
+        from the last offset seen, one record per line.
+
+        Files are read and parsed on the watcher thread, outside the engine's
+        data lock; only the index update itself waits for in-flight matching.
+
+        Args:
+            engine: Engine to update
+            interval: Seconds between polls
+            append_logs: Optional {"email"|"calendar": path} JSONL logs to tail
+        """
+        self.engine = engine
+        self.interval = interval
+        self.files: Dict[str, str] = {"email": engine.emails_path, "calendar": engine.calendar_path}
+        self.append_logs: Dict[str, str] = dict(append_logs or {})
+        self._stamps: Dict[str, Tuple[float, int]] = {}
+        self._offsets: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Changes made before the watcher started are already in the engine
+        for path in self.files.values():
+            self._stamps[path] = self._stamp(path)
+        for path in self.append_logs.values():
+            self._offsets[path] = os.path.getsize(path) if os.path.exists(path) else 0
+
+    @staticmethod
+    def _stamp(path: str) -> Tuple[float, int]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return (0.0, -1)
+        return (stat.st_mtime, stat.st_size)
+
+    def _read_log(self, path: str) -> List[dict]:
+        offset = self._offsets.get(path, 0)
+        if not os.path.exists(path):
+            return []
+        if os.path.getsize(path) < offset:
+            offset = 0  # truncated or rotated
+        records = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written; pick it up next poll
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+        self._offsets[path] = offset
+        return records
+
+    def poll(self) -> Dict[str, Dict[str, int]]:
+        """
+        Check every watched file once and ingest what changed.
+
+        Returns:
+            Ingest counts per source kind that had changes
+        """
+        changes: Dict[str, List[dict]] = {}
+        for kind, path in self.files.items():
+            stamp = self._stamp(path)
+            if stamp != self._stamps.get(path) and stamp[1] >= 0:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        records = json.load(f)
+                except ValueError:
+                    continue  # mid-write; the stamp stays stale so it is retried
+                self._stamps[path] = stamp
+                changes.setdefault(kind, []).extend(records)
+        for kind, path in self.append_logs.items():
+            records = self._read_log(path)
+            if records:
+                changes.setdefault(kind, []).extend(records)
+
+        return {kind: self.engine.ingest(kind, records) for kind, records in changes.items()}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                results = self.poll()
+            except Exception as e:
+                logger.error("Data watcher failed: %s", e)
+                continue
+            for kind, counts in results.items():
+                if counts["added"] or counts["updated"]:
+                    logger.info("Ingested %s changes: %s", kind, counts)
+
+    def start(self) -> "DataWatcher":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,68 @@
+import json
+import re
+
+import pytest
+
+from src.nlp.aho_corasick import AhoCorasick
+from src.nlp.entity_extractor import MeetingEntityExtractor
+from src.nlp.metadata import derive_metadata
+
+SUBSTRING_CATEGORIES = ["team", "locations"]
+WORD_CATEGORIES = ["topic", "meeting_types"]
+
+EXTRA_TEXTS = [
+    "hrteam sync", "engineering-team review", "zoomzoom call", "conference room ab", "conference roomA",
+    "demos and code-review", "code reviewcode review", "HR TEAM Training", "meet in Room B or room c",
+    "", "a", "design reviews with legal's team", "standup/standup", "product_demo",
+]
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module", params=["curated", "derived"])
+def extractor(request):
+    if request.param == "curated":
+        return MeetingEntityExtractor(tier="dictionary")
+    records = load("Data/emails.json") + load("Data/calendar_events.json")
+    return MeetingEntityExtractor(metadata_dict=derive_metadata(records, load("Data/metadata.json")),
+                                  tier="dictionary")
+
+
+@pytest.fixture(scope="module")
+def texts():
+    records = load("Data/emails.json") + load("Data/calendar_events.json")
+    fields = ["subject", "body", "title", "description", "location"]
+    return EXTRA_TEXTS + [record[field] for record in records for field in fields if record.get(field)]
+
+
+def scan(extractor, text):
+    """The per-key loops the automaton replaced"""
+    text_lower = text.lower()
+    result = {}
+    for category in SUBSTRING_CATEGORIES:
+        result[category] = {value for key, value in extractor.processed_metadata[category].items()
+                            if key in text_lower}
+    for category in WORD_CATEGORIES:
+        result[category] = {value for key, value in extractor.processed_metadata[category].items()
+                            if re.search(r'\b' + re.escape(key) + r'\b', text_lower)}
+    return result
+
+
+def test_dictionary_matches_agree_with_scan(extractor, texts):
+    for text in texts:
+        entities = extractor.extract_entities(text)
+        expected = scan(extractor, text)
+        for category in SUBSTRING_CATEGORIES + WORD_CATEGORIES:
+            assert entities[category] == expected[category], (category, text)
+
+
+def test_finditer_reports_overlapping_matches():
+    matcher = AhoCorasick()
+    for key in ["he", "she", "hers", "his"]:
+        matcher.add(key, key)
+    matcher.build()
+    found = sorted((start, end, value) for start, end, value in matcher.finditer("ushers"))
+    assert found == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
@@ -0,0 +1,64 @@
+import pytest
+
+from src.query.engine import QueryEngine
+from src.query.sharding import ShardedQueryEngine
+
+QUERIES = [
+    "email from sarah to james",
+    "",
+    "meetings in july 2025",
+    "emails about (code review or demo) and not hr",
+    "email from sarah to james",
+    "   ",
+    "hr team training meeting",
+    "Meetings in July 2025",
+    "show me anything",
+]
+
+
+def pages(results):
+    return [([record["id"] for record in page], page.total) for page in results]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+
+
+@pytest.mark.parametrize("limit, offset", [(None, 0), (5, 0), (3, 2)])
+@pytest.mark.parametrize("match_mode", ["substring", "word"])
+def test_batch_matches_single_queries(engine, limit, offset, match_mode):
+    expected = [engine.process_query(query, use_cache=False, limit=limit, offset=offset, match_mode=match_mode)
+                for query in QUERIES]
+    results = engine.process_queries(QUERIES, use_cache=False, limit=limit, offset=offset, match_mode=match_mode)
+    assert len(results) == len(QUERIES)
+    assert pages(results) == pages(expected)
+
+
+def test_batch_fills_and_reads_the_result_cache(engine):
+    engine.cache.clear()
+    first = engine.process_queries(QUERIES, limit=5)
+    hits = engine.cache.hits
+    second = engine.process_queries(QUERIES, limit=5)
+    assert pages(second) == pages(first)
+    # Each distinct non-empty query is answered from the cache once
+    assert engine.cache.hits - hits == len({query for query in QUERIES if query.strip()})
+    assert pages([engine.process_query(query, limit=5) for query in QUERIES]) == pages(first)
+
+
+def test_duplicate_queries_are_analyzed_once(engine, monkeypatch):
+    analyzed = []
+    analyze = engine.analyze
+    monkeypatch.setattr(engine, "analyze", lambda query, **kwargs: analyzed.append(query) or analyze(query, **kwargs))
+    engine.process_queries(QUERIES, use_cache=False)
+    assert sorted(analyzed) == sorted({query for query in QUERIES if query.strip()})
+
+
+def test_sharded_batch_matches_single_queries():
+    single = QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+    sharded = ShardedQueryEngine(extraction_tier="dictionary", metadata_artifact=None, shards=2)
+    try:
+        results = sharded.process_queries(QUERIES, use_cache=False, limit=5)
+    finally:
+        sharded.close()
+    assert pages(results) == pages([single.process_query(query, use_cache=False, limit=5) for query in QUERIES])
@@ -0,0 +1,94 @@
+import pytest
+
+from src.query.bitmap import Bitmap
+from src.query.engine import QueryEngine
+from src.query.sharding import ShardedQueryEngine
+
+
+class SetBitmap:
+    """Plain frozenset result type, checking that no Bitmap leaks into results"""
+
+    def __init__(self, ids=()):
+        self.ids = frozenset(ids)
+
+    @classmethod
+    def from_ids(cls, ids):
+        return cls(ids)
+
+    @classmethod
+    def full(cls, size):
+        return cls(range(size))
+
+    @property
+    def nbytes(self):
+        return 8 * len(self.ids)
+
+    def _other(self, other):
+        assert type(other) is SetBitmap, f"mixed result types: {type(other).__name__}"
+        return other.ids
+
+    def __and__(self, other):
+        return SetBitmap(self.ids & self._other(other))
+
+    def __or__(self, other):
+        return SetBitmap(self.ids | self._other(other))
+
+    def __sub__(self, other):
+        return SetBitmap(self.ids - self._other(other))
+
+    def __contains__(self, i):
+        return i in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(sorted(self.ids))
+
+
+QUERIES = [
+    "emails about (code review or demo) and not hr",
+    "email from sarah in july 2025",
+    "meetings not zoom about demo",
+    "hr team training meeting",
+    "emails in august 2025",
+]
+
+
+def ids(page):
+    return [record["id"] for record in page]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_engine_uses_given_bitmap_class(columnar):
+    if columnar:
+        pytest.importorskip("numpy")
+    kwargs = dict(extraction_tier="dictionary", metadata_artifact=None, columnar=columnar)
+    plain, custom = QueryEngine(**kwargs), QueryEngine(bitmap_cls=SetBitmap, **kwargs)
+    for query in QUERIES:
+        assert ids(custom.process_query(query, use_cache=False, limit=None)) == \
+            ids(plain.process_query(query, use_cache=False, limit=None))
+    source = custom.source("email")
+    assert type(source.universe) is SetBitmap
+    assert type(source.match("demo")) is SetBitmap
+    assert type(source.date_matches("2025-07-01", "2025-07-31")) is SetBitmap
+
+
+def test_sharded_engine_uses_given_bitmap_class():
+    plain = QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+    sharded = ShardedQueryEngine(extraction_tier="dictionary", metadata_artifact=None, shards=2,
+                                 bitmap_cls=SetBitmap)
+    try:
+        for query in QUERIES:
+            assert ids(sharded.process_query(query, use_cache=False, limit=None)) == \
+                ids(plain.process_query(query, use_cache=False, limit=None))
+    finally:
+        sharded.close()
+
+
+def test_bitmap_set_operations():
+    a, b = Bitmap.from_ids([1, 5, 9, 200]), Bitmap.from_ids([5, 9, 10])
+    assert list(a & b) == [5, 9]
+    assert list(a | b) == [1, 5, 9, 10, 200]
+    assert list(a - b) == [1, 200]
+    assert len(Bitmap.full(70)) == 70 and 69 in Bitmap.full(70)
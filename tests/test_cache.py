@@ -0,0 +1,48 @@
+import pytest
+
+from src.query import engine as engine_module
+from src.query.bitmap import Bitmap
+from src.query.cache import QueryCache
+from src.query.engine import QueryEngine
+
+
+def test_byte_bound_evicts_least_recently_used():
+    cache = QueryCache(maxsize=100, ttl=None, maxbytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.get("a")
+    cache.put("c", "xxxx")
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxxx" and cache.get("c") == "xxxx"
+    assert cache.nbytes == 8
+
+
+def test_byte_bound_skips_oversized_values_and_tracks_replacements():
+    cache = QueryCache(maxsize=100, ttl=None, maxbytes=10, sizeof=len)
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+    cache.put("a", "xxxx")
+    cache.put("a", "xx")
+    assert cache.nbytes == 2
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_maxbytes_requires_sizeof():
+    with pytest.raises(ValueError):
+        QueryCache(maxbytes=10)
+
+
+def test_bitmap_nbytes_follows_highest_id():
+    assert Bitmap().nbytes == 0
+    assert Bitmap.from_ids([0]).nbytes == 1
+    assert Bitmap.from_ids([8_000_000]).nbytes == 1_000_001
+
+
+def test_term_cache_stays_within_bytes(monkeypatch):
+    monkeypatch.setattr(engine_module, "TERM_CACHE_BYTES", 64)
+    source = QueryEngine(extraction_tier="dictionary", metadata_artifact=None).source("email")
+    for term in ["demo", "review", "deployment", "training", "budget", "hr", "legal", "standup"]:
+        source.match(term)
+    assert 0 < source.term_cache.nbytes <= 64
+    assert source.term_cache.evictions > 0
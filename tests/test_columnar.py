@@ -0,0 +1,76 @@
+import pytest
+
+from src.query.engine import DataSource, QueryEngine
+
+pytest.importorskip("numpy")
+
+QUERIES = [
+    "email from sarah to james",
+    "emails from sarah cc james",
+    "meetings with Sarah in Zoom",
+    "emails in august 2025",
+    "standup meetings with priya",
+]
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return (QueryEngine(extraction_tier="dictionary", metadata_artifact=None),
+            QueryEngine(extraction_tier="dictionary", metadata_artifact=None, columnar=True))
+
+
+def ids(page):
+    return [record["id"] for record in page]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_columnar_matches_row_engine(engines, query):
+    plain, columnar = engines
+    assert ids(columnar.process_query(query, use_cache=False, limit=None)) == \
+        ids(plain.process_query(query, use_cache=False, limit=None))
+
+
+def test_rows_come_from_records(engines):
+    _, columnar = engines
+    source = columnar.source("email")
+    assert all(row is source.records[i] for i, row in enumerate(source.rows(range(10))))
+
+
+def test_columnar_follows_upserts(engines):
+    plain, columnar = engines
+    record = dict(plain.source("email").records[0], id="email_test_columnar",
+                  sender="Qzx Person", cc=["Priya Patel"])
+    for engine in engines:
+        engine.ingest("email", [record])
+    for query in ("email from qzx", "emails cc priya"):
+        assert ids(columnar.process_query(query, use_cache=False, limit=None)) == \
+            ids(plain.process_query(query, use_cache=False, limit=None))
+    assert "email_test_columnar" in ids(columnar.process_query("email from qzx", use_cache=False))
+
+
+@pytest.mark.parametrize("mode", ["substring", "word", "prefix"])
+@pytest.mark.parametrize("term", ["sarah", "from:tom", "cc:priya", "zoom", "review", "hr"])
+def test_estimates_bound_matches(engines, term, mode):
+    _, columnar = engines
+    for kind in ("email", "calendar"):
+        source = columnar.source(kind)
+        assert source.estimate(term, mode) >= len(source.match(term, mode))
+
+
+def test_index_skips_store_fields(engines):
+    _, columnar = engines
+    source = columnar.source("email")
+    assert "sender" in source.store_fields
+    assert "sender" not in source.index.postings
+    assert source.team_count("legal") == len(source.team_matches("legal")) > 0
+
+
+def test_malformed_timestamps_are_undated(engines):
+    plain, _ = engines
+    records = [dict(record) for record in plain.source("calendar").records[:3]]
+    records[0]["timestamp"] = "2025-13-45T99:00:00"
+    records[1]["timestamp"] = "not a timestamp"
+    source = DataSource("calendar", records, columnar=True)
+    assert list(source.date_matches(None, None)) == [2]
+    source.upsert([dict(records[2], timestamp="2025-02-30T10:00:00")])
+    assert list(source.date_matches(None, None)) == []
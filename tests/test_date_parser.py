@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+from src.nlp.date_parser import DateParser
+
+REFERENCE = datetime(2025, 8, 14, 15, 30)
+
+# Expressions the rule grammar resolves, which must agree with dateparser
+RULE_PHRASES = [
+    "emails today",
+    "emails yesterday",
+    "meetings tomorrow",
+    "emails last 3 days",
+    "emails in last 10 days",
+    "project update meeting since last 4 days",
+    "emails past 2 weeks",
+    "emails past 3 months",
+    "emails 2 days ago",
+    "emails a week ago",
+    "emails in july",
+    "emails in July 2025",
+    "emails in sept 2024",
+    "emails before may",
+    "emails before 2025-07-15",
+    "emails since 2025-07-01",
+    "emails since yesterday",
+    "meeting on monday",
+    "emails last thursday",
+    "emails on 2025-07-22",
+    "emails 2025/07/22",
+    "emails on 07/22/2025",
+    "emails on 22/07/2025",
+    "emails on july 22",
+    "meetings on july 22nd",
+    "emails on 31st july",
+    "emails 22nd july 2025",
+    "emails july 22, 2025",
+    "emails on jan 3rd",
+    "emails from jan 2025 to mar 2025",
+    "emails between march 2025 and may 2025",
+    "emails from june to august",
+    "emails from 2025-07-01 to 2025-07-31",
+    "email from sarah to james",
+    "emails about deployment and not legal",
+]
+
+
+@pytest.fixture(scope="module")
+def parser():
+    return DateParser(REFERENCE)
+
+
+@pytest.mark.parametrize("text", RULE_PHRASES)
+def test_rule_grammar_matches_dateparser(parser, text):
+    dates = parser._rule_dates(text)
+    assert dates is not None, "expected the rule grammar to resolve this"
+    assert dates == parser._dateparser_dates(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    # dateparser reads "to" as today
+    ("email to anna", []),
+    # dateparser reads "the" as January
+    ("emails in the last 7 days", ["2025-08-07"]),
+    # dateparser keeps the reference day of the month
+    ("emails since jan 2025", ["2025-01-01"]),
+])
+def test_rule_grammar_fixes(parser, text, expected):
+    assert parser.extract_all_dates(text) == expected
+
+
+@pytest.mark.parametrize("text", ["emails last week", "emails after june", "emails in jan 0000", "email from may"])
+def test_unrecognized_falls_back(parser, text):
+    assert parser._rule_dates(text) is None
+    assert parser.extract_all_dates(text) == parser._dateparser_dates(text)
+
+
+def test_path_stats():
+    parser = DateParser(REFERENCE)
+    parser.extract_all_dates("emails yesterday")
+    parser.extract_all_dates("emails last week")
+    stats = parser.path_stats()
+    assert (stats["rules"], stats["dateparser"], stats["rule_hit_rate"]) == (1, 1, 0.5)
@@ -0,0 +1,32 @@
+from datetime import date, datetime
+
+from src.query.engine import QueryEngine
+
+
+def test_reference_day_rolls_over():
+    engine = QueryEngine(metadata_artifact=None)
+    engine.date_parser.set_reference(datetime(2020, 1, 1, 23, 59))
+
+    key = engine.cache_key("emails yesterday")
+
+    assert key[1] == date.today().isoformat()
+    assert engine.date_parser.reference.date() == date.today()
+
+
+def test_batch_reuses_nlp_cache(tmp_path, monkeypatch):
+    queries = ["email from sarha about demo", "meetings with priya"]
+    path = str(tmp_path / "nlp_cache.sqlite")
+    first = QueryEngine(extraction_tier="dictionary", metadata_artifact=None, nlp_cache_path=path)
+    expected = [[r["id"] for r in page] for page in first.process_queries(queries, use_cache=False)]
+    first.nlp_cache.close()
+
+    # A fresh engine, as after a restart
+    second = QueryEngine(extraction_tier="dictionary", metadata_artifact=None, nlp_cache_path=path)
+    extractor = second.entity_extractor
+    calls = []
+    for name in ("extract_batch_with_aliases", "extract_with_aliases", "person_aliases"):
+        monkeypatch.setattr(extractor, name, lambda *args, name=name, **kwargs: calls.append(name))
+
+    pages = second.process_queries(queries, use_cache=False)
+    assert calls == []
+    assert [[r["id"] for r in page] for page in pages] == expected
@@ -0,0 +1,36 @@
+import pytest
+
+from src.query.engine import QueryEngine
+
+QUERY = "email from sarha about demo"
+
+
+@pytest.fixture
+def engine():
+    return QueryEngine(extraction_tier="auto", metadata_artifact=None)
+
+
+@pytest.fixture
+def alias_calls(engine, monkeypatch):
+    extractor = engine.entity_extractor
+    calls = []
+    person_aliases = extractor.person_aliases
+
+    def counted(text):
+        calls.append(text)
+        return person_aliases(text)
+
+    monkeypatch.setattr(extractor, "person_aliases", counted)
+    return calls
+
+
+def test_aliases_resolved_once_per_query(engine, alias_calls):
+    analysis = engine.analyze(QUERY)
+    assert analysis["people_aliases"] == {"sarha": "sarah.chen"}
+    assert "sarah.chen" in analysis["entities"]["people"]
+    assert alias_calls == [QUERY]
+
+
+def test_aliases_resolved_once_per_batched_query(engine, alias_calls):
+    engine.process_queries([QUERY, "meetings with priya"], use_cache=False)
+    assert sorted(alias_calls) == sorted([QUERY, "meetings with priya"])
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from src.query import planner
+from src.query.engine import QueryEngine
+from src.query.sharding import ShardedQueryEngine
+
+QUERIES = [
+    "emails from sarah about demo in july 2025",
+    "emails about (code review or demo) and not hr",
+    "legal team emails about standup in june 2025",
+    "meetings not zoom about demo",
+    "hr team training meeting",
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+
+
+def filter_node(plan):
+    return next(node for node in plan["children"] if node["stage"] == "filter")
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_plan_is_json(engine, query):
+    plan = engine.explain(query).plan
+    assert json.loads(json.dumps(plan)) == plan
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_plan_reports_evaluation_order(engine, query, monkeypatch):
+    calls = []
+    for cls in (planner.TermPredicate, planner.TeamPredicate, planner.DatePredicate,
+                planner.AnyOf, planner.BooleanPredicate):
+        for name in ("resolve", "check"):
+            method = getattr(cls, name)
+            monkeypatch.setattr(cls, name, lambda self, *args, method=method: calls.append(self.label)
+                                or method(self, *args))
+
+    results = engine.explain(query)
+    node = filter_node(results.plan)
+    steps = [child for child in node["children"] if child["method"] != "skipped"]
+    labels = [child["predicate"] for child in node["children"]]
+    assert [label for label in dict.fromkeys(calls) if label in labels] == [child["predicate"] for child in steps]
+
+    rows = node["rows_in"]
+    for child in node["children"]:
+        assert child["rows_in"] == rows
+        rows = child["rows_out"]
+    assert rows == node["rows_out"] == results.total
+
+
+def test_sharded_plan_is_json():
+    sharded = ShardedQueryEngine(extraction_tier="dictionary", metadata_artifact=None, shards=2)
+    try:
+        plan = sharded.explain(QUERIES[0]).plan
+    finally:
+        sharded.close()
+    assert json.loads(json.dumps(plan)) == plan
+    shards = next(node for node in plan["children"] if node["stage"] == "shards")
+    assert sum(shard["rows_out"] for shard in shards["children"]) == plan["total"]
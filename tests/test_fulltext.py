@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from src.query.engine import QueryEngine
+
+TERMS = ["review", "code review", "deploy", "the", "demo progress", "sarah", "room a", "Q3", "bug fix", "tom.garcia"]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+
+
+def words(text):
+    return re.findall(r"\w+", text.casefold())
+
+
+def oracle(text, term, mode):
+    """Match modes spelled out over a plain word split of the text"""
+    if mode == "substring":
+        return term.casefold() in text.casefold()
+    wanted, tokens = words(term), words(text)
+    if not wanted:
+        return False
+    if mode == "word":
+        return all(word in tokens for word in wanted)
+    if mode == "prefix":
+        return all(any(token.startswith(word) for token in tokens) for word in wanted)
+    return any(tokens[i:i + len(wanted)] == wanted for i in range(len(tokens) - len(wanted) + 1))
+
+
+def values(record, field):
+    value = record.get(field) or ""
+    return value if isinstance(value, list) else [value]
+
+
+@pytest.mark.parametrize("kind", ["email", "calendar"])
+@pytest.mark.parametrize("mode", ["substring", "word", "phrase", "prefix"])
+@pytest.mark.parametrize("term", TERMS)
+def test_match_modes_agree_with_scan(engine, kind, mode, term):
+    source = engine.source(kind)
+    expected = [row for row, record in enumerate(source.records)
+                if any(oracle(value, term, mode) for field in source.search_fields for value in values(record, field))]
+    assert list(source.match(term, mode)) == expected
+
+
+def test_modes_differ_as_documented(engine):
+    source = engine.source("email")
+    assert len(source.match("deploy", "prefix")) > len(source.match("deploy", "word")) == 0
+    assert set(source.match("review code", "phrase")) < set(source.match("review code", "word"))
@@ -0,0 +1,24 @@
+import pytest
+
+from src.query.engine import QueryEngine
+
+TERMS = ["the", "review", "deployment", "sarah", "zz", "from:sarah", "to:james", "conference room", "qzxv"]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+
+
+@pytest.mark.parametrize("kind", ["email", "calendar"])
+@pytest.mark.parametrize("term", TERMS)
+def test_estimate_bounds_matches(engine, kind, term):
+    source = engine.source(kind)
+    assert source.estimate(term) >= len(source.match(term))
+
+
+def test_estimate_follows_upserts(engine):
+    source = engine.source("email")
+    before = source.estimate("qzxvword")
+    engine.ingest("email", [dict(source.records[0], id="email_estimate_test", subject="qzxvword")])
+    assert source.estimate("qzxvword") == before + 1 == len(source.match("qzxvword"))
@@ -0,0 +1,105 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.query.engine import QueryEngine
+
+QUERIES = [
+    "emails about deployment",
+    "email from sarah",
+    "emails from tom in july 2025",
+    "emails cc priya",
+    "meetings in zoom about demo",
+    "code review meeting",
+]
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def changes(emails, events):
+    """New and changed records, including a row updated twice in one batch"""
+    new_email = dict(emails[0], id="email_ingest_new", sender="sarah.chen",
+                     subject="Deployment rollback plan", timestamp="2025-07-03T09:00:00")
+    email_changes = [
+        dict(emails[0], subject="Deployment checklist", sender="tom.garcia", cc=["priya.patel"],
+             timestamp="2025-07-10T10:00:00"),
+        dict(emails[1], body="The deployment moved to Friday."),
+        emails[2],
+        new_email,
+        dict(new_email, body="Deployment deployment deployment."),
+    ]
+    event_changes = [
+        dict(events[0], location="Conference Room A", topic="interview"),
+        dict(events[1], id="event_ingest_new", location="Zoom", topic="demo", title="Demo dry run"),
+    ]
+    return email_changes, event_changes
+
+
+def apply(records, updates):
+    rows = {record["id"]: n for n, record in enumerate(records)}
+    records = list(records)
+    for record in updates:
+        if record["id"] in rows:
+            records[rows[record["id"]]] = record
+        else:
+            rows[record["id"]] = len(records)
+            records.append(record)
+    return records
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_ingest_matches_rebuilt_engine(tmp_path, columnar):
+    if columnar:
+        pytest.importorskip("numpy")
+    live = QueryEngine(extraction_tier="dictionary", metadata_artifact=None, columnar=columnar)
+    emails, events = load(live.emails_path), load(live.calendar_path)
+    email_changes, event_changes = changes(emails, events)
+
+    assert live.ingest("email", email_changes) == {"added": 1, "updated": 3, "unchanged": 1}
+    assert live.ingest("calendar", event_changes) == {"added": 1, "updated": 1, "unchanged": 0}
+
+    emails_path, calendar_path = tmp_path / "emails.json", tmp_path / "calendar.json"
+    emails_path.write_text(json.dumps(apply(emails, email_changes)))
+    calendar_path.write_text(json.dumps(apply(events, event_changes)))
+    rebuilt = QueryEngine(str(emails_path), str(calendar_path), extraction_tier="dictionary",
+                          metadata_artifact=None, columnar=columnar)
+
+    for query in QUERIES:
+        for limit in (5, None):
+            expected = rebuilt.process_query(query, use_cache=False, limit=limit)
+            page = live.process_query(query, use_cache=False, limit=limit)
+            assert page.total == expected.total, query
+            assert [r["id"] for r in page] == [r["id"] for r in expected], query
+
+
+def test_sources_load_once_across_threads(monkeypatch):
+    engine = QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+    loads = []
+    load_source = engine._load_source
+
+    def slow_load(kind):
+        loads.append(kind)
+        time.sleep(0.05)
+        return load_source(kind)
+
+    monkeypatch.setattr(engine, "_load_source", slow_load)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sources = list(pool.map(lambda _: engine.source("email"), range(4)))
+    assert loads == ["email"]
+    assert all(source is sources[0] for source in sources)
+
+
+def test_ingest_learns_new_people(tmp_path):
+    engine = QueryEngine(extraction_tier="dictionary", metadata_artifact=str(tmp_path / "metadata.compiled.json"))
+    query = "email from quentin"
+    assert "quentin.zhao" not in engine.analyze(query)["entities"]["people"]
+
+    record = dict(load(engine.emails_path)[0], id="email_ingest_person", sender="quentin.zhao")
+    engine.ingest("email", [record])
+    assert "quentin.zhao" in engine.analyze(query)["entities"]["people"]
+    assert [r["id"] for r in engine.process_query(query, use_cache=False)] == ["email_ingest_person"]
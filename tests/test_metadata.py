@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.nlp.entity_extractor import MeetingEntityExtractor
+from src.nlp.metadata import build_artifact, load_artifact
+
+SOURCES = ["Data/emails.json", "Data/calendar_events.json"]
+
+
+def test_concurrent_builds_do_not_collide(tmp_path):
+    path = str(tmp_path / "metadata.compiled.json")
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(build_artifact, path, SOURCES, "Data/metadata.json") for _ in range(8)]
+        headers = [future.result()["header"] for future in futures]
+
+    artifact = load_artifact(path)
+    assert artifact["header"] == headers[0]
+    assert artifact["metadata"]["people"]
+    assert os.listdir(tmp_path) == ["metadata.compiled.json"]
+
+
+def test_artifact_tables_match_metadata(tmp_path):
+    path = str(tmp_path / "metadata.compiled.json")
+    build_artifact(path, SOURCES, "Data/metadata.json")
+    artifact = load_artifact(path)
+
+    direct = MeetingEntityExtractor(metadata_dict=artifact["metadata"], tier="dictionary")
+    loaded = MeetingEntityExtractor(compiled=artifact["tables"], tier="dictionary")
+    assert loaded.cache_version() == direct.cache_version()
+    for text in ["email from sarha about code review", "meetings in conference room a", "hr team training"]:
+        assert loaded.extract_with_aliases(text) == direct.extract_with_aliases(text)
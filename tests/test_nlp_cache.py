@@ -0,0 +1,25 @@
+from src.query.nlp_cache import EVICTION_INTERVAL, NLPCache
+
+
+def test_round_trip_across_connections(tmp_path):
+    path = str(tmp_path / "nlp.sqlite")
+    writer, reader = NLPCache(path), NLPCache(path)
+    writer.put("dates", ["emails last week", "2025-08-14"], {"dates": ["2025-08-07"], "range": False})
+
+    assert reader.get("dates", ["emails last week", "2025-08-14"]) == {"dates": ["2025-08-07"], "range": False}
+    assert reader.get("dates", ["emails last week", "2025-08-15"]) is None
+    assert (reader.hits, reader.misses) == (1, 1)
+
+
+def test_recently_hit_entries_survive_eviction(tmp_path):
+    cache = NLPCache(str(tmp_path / "nlp.sqlite"), max_entries=EVICTION_INTERVAL)
+    for i in range(2 * EVICTION_INTERVAL - 1):
+        cache.put("entities", [f"query {i}"], i)
+    assert cache.get("entities", ["query 0"]) == 0
+
+    # This write triggers eviction, which first records the pending hit
+    cache.put("entities", ["last query"], -1)
+
+    assert cache.get("entities", ["query 0"]) == 0
+    assert cache.get("entities", ["query 1"]) is None
+    assert len(cache) == EVICTION_INTERVAL
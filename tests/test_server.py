@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+
+from src.query.engine import QueryEngine
+from src.query.ranking import ResultPage
+from src.query.server import QueryServer
+
+
+class SlowEngine(QueryEngine):
+    """Engine whose queries block until released"""
+
+    def __init__(self):
+        super().__init__(extraction_tier="dictionary", metadata_artifact=None)
+        self.release = threading.Event()
+
+    def warmup(self) -> float:
+        return 0.0
+
+    def classify_intent(self, user_query: str) -> str:
+        return "email"
+
+    def process_query(self, user_query, use_cache=True, limit=None, offset=0, match_mode="substring",
+                      explain=False):
+        self.release.wait(5)
+        return ResultPage()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def body(**request) -> bytes:
+    return json.dumps(request).encode("utf-8")
+
+
+def test_timed_out_query_keeps_its_slot():
+    async def scenario():
+        engine = SlowEngine()
+        server = QueryServer(engine, port=0, workers=1, max_pending=1, timeout=0.05)
+        await server.start()
+        try:
+            status, _ = await server._query(body(query="email from sarah"))
+            assert status == 504
+            # The query is still running on the pool, so the server is full
+            assert server.pending == 1
+            status, _ = await server._query(body(query="email from sarah"))
+            assert status == 503
+
+            engine.release.set()
+            for _ in range(100):
+                if not server.pending:
+                    break
+                await asyncio.sleep(0.01)
+            assert server.pending == 0
+            status, _ = await server._query(body(query="email from sarah"))
+            assert status == 200
+        finally:
+            engine.release.set()
+            server.close()
+
+    run(scenario())
+
+
+def test_rejects_bool_limit_and_offset():
+    async def scenario():
+        engine = SlowEngine()
+        engine.release.set()
+        server = QueryServer(engine, port=0, workers=1)
+        await server.start()
+        try:
+            assert (await server._query(body(query="email", limit=True)))[0] == 400
+            assert (await server._query(body(query="email", offset=False)))[0] == 400
+            assert (await server._query(body(query="email", limit=2, offset=0)))[0] == 200
+        finally:
+            server.close()
+
+    run(scenario())
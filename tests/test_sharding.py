@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.query.engine import QueryEngine
+from src.query.sharding import ShardedQueryEngine
+
+QUERIES = [
+    "emails about deployment",
+    "email from sarah",
+    "emails about demo or training",
+    "code review meeting",
+    "meetings about interview with engineering team",
+]
+
+
+@pytest.fixture(scope="module")
+def engines():
+    single = QueryEngine(extraction_tier="dictionary", metadata_artifact=None)
+    sharded = ShardedQueryEngine(extraction_tier="dictionary", metadata_artifact=None, shards=3)
+    yield single, sharded
+    sharded.close()
+
+
+def ids(page):
+    return [record["id"] for record in page]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("limit, offset", [(5, 0), (4, 3), (None, 0)])
+def test_sharded_pages_match_single_engine(engines, query, limit, offset):
+    single, sharded = engines
+    expected = single.process_query(query, use_cache=False, limit=limit, offset=offset)
+    page = sharded.process_query(query, use_cache=False, limit=limit, offset=offset)
+    assert page.total == expected.total
+    assert ids(page) == ids(expected)
+
+
+def test_statistics_follow_ingest(engines):
+    single, sharded = engines
+    record = dict(single.source("email").records[0], id="email_test_ingest",
+                  subject="deployment deployment rollback", body="deployment checklist")
+    for engine in engines:
+        engine.ingest("email", [record])
+    query = "emails about deployment"
+    assert ids(sharded.process_query(query, use_cache=False, limit=5)) == \
+        ids(single.process_query(query, use_cache=False, limit=5))
+
+
+def test_concurrent_first_queries_start_one_set_of_shards(monkeypatch):
+    engine = ShardedQueryEngine(extraction_tier="dictionary", metadata_artifact=None, shards=2)
+    reads = []
+    read_records = engine._read_records
+
+    def slow_read(kind):
+        reads.append(kind)
+        time.sleep(0.05)
+        return read_records(kind)
+
+    monkeypatch.setattr(engine, "_read_records", slow_read)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            pages = list(pool.map(lambda _: engine.process_query(QUERIES[0], use_cache=False), range(4)))
+        assert sorted(reads) == ["calendar", "email"]
+        assert len(engine._shards) == 2
+        assert len({tuple(ids(page)) for page in pages}) == 1
+    finally:
+        engine.close()
+
+
+def test_queries_wait_for_ingest_on_every_shard(engines):
+    single, sharded = engines
+    query = "emails about deployment"
+    record = dict(single.source("email").records[1], id="email_test_fanout",
+                  subject="deployment deployment fanout")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with sharded._data_lock:
+            pending = pool.submit(sharded.process_query, query, use_cache=False, limit=None)
+            time.sleep(0.05)
+            assert not pending.done()
+            single.ingest("email", [record])
+            sharded.ingest("email", [record])
+        assert ids(pending.result()) == ids(single.process_query(query, use_cache=False, limit=None))